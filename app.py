@@ -1,8 +1,9 @@
+import io
 import os
 import time
 import uuid
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_from_directory, session
+from flask import Flask, render_template, request, jsonify, send_file, send_from_directory, session
 from werkzeug.utils import secure_filename
 from werkzeug.exceptions import RequestEntityTooLarge
 from dotenv import load_dotenv
@@ -13,7 +14,7 @@ from services.llm_service import llm_service
 from services.pdf_service import pdf_service
 from services.voice_service import voice_service
 from services.database_service import db_service
-from services.rag_service import rag_service
+from services.rag_service import get_rag_service
 from services.adaptive_learning import adaptive_learning
 from services.teacher_mode import teacher_mode
 from flask_limiter import Limiter
@@ -98,7 +99,7 @@ def ask_question_page():
                 return jsonify({'error': 'Question is required'}), 400
             
             # Use the RAG service to process the question
-            answer_data = rag_service.process_question(question, llm_service, user_id)
+            answer_data = get_rag_service().process_question(question, llm_service, user_id)
             
             return jsonify({
                 'success': True,
@@ -222,7 +223,7 @@ def generate_questions():
             
             # Add PDF content to RAG database for doubt resolution
             try:
-                rag_service.add_pdf_content(
+                get_rag_service().add_pdf_content(
                     filename, 
                     pdf_data['text'], 
                     metadata={
@@ -429,6 +430,7 @@ def speak():
         text = data.get('text', '')
         language = data.get('language', 'en')
         use_offline = data.get('use_offline', False)
+        stream = data.get('stream', False)
         
         print(f"🔊 Speak endpoint: Text='{text[:50]}...', Language={language}, Offline={use_offline}")
         
@@ -438,10 +440,15 @@ def speak():
         
         # Convert text to speech
         print("🔊 Speak endpoint: Calling voice_service.text_to_speech")
-        result = voice_service.text_to_speech(text, language, use_offline)
+        result = voice_service.text_to_speech(text, language, use_offline, return_bytes=stream)
         
         print(f"🔊 Speak endpoint: TTS result success={result.get('success', False)}")
         
+        # Streamed online audio is sent straight from memory; offline fallbacks still return a file URL
+        if result['success'] and 'audio_bytes' in result:
+            print(f"✅ Speak endpoint: TTS successful, streaming {len(result['audio_bytes'])} bytes")
+            return send_file(io.BytesIO(result['audio_bytes']), mimetype=result['mimetype'])
+        
         if result['success']:
             print(f"✅ Speak endpoint: TTS successful, audio file: {result.get('filename', 'unknown')}")
             return jsonify(result)
@@ -861,7 +868,7 @@ def ask_question():
             return jsonify({'error': 'Question is required'}), 400
         
         # Use the new process_question method that handles both curriculum and general knowledge
-        answer_data = rag_service.process_question(question, llm_service, user_id)
+        answer_data = get_rag_service().process_question(question, llm_service, user_id)
         
         return jsonify({
             'success': True,
@@ -882,7 +889,7 @@ def get_question_history():
     try:
         user_id = get_user_id()
         limit = request.args.get('limit', 10, type=int)
-        history = rag_service.get_user_question_history(user_id, limit)
+        history = get_rag_service().get_user_question_history(user_id, limit)
         return jsonify({'history': history})
     except Exception as e:
         return jsonify({'error': f'Error getting history: {str(e)}'}), 500
@@ -893,7 +900,7 @@ def get_recent_questions():
     try:
         user_id = get_user_id()
         limit = request.args.get('limit', 5, type=int)
-        history = rag_service.get_user_question_history(user_id, limit)
+        history = get_rag_service().get_user_question_history(user_id, limit)
         return jsonify({'questions': history})
     except Exception as e:
         return jsonify({'error': f'Error getting recent questions: {str(e)}'}), 500
@@ -919,8 +926,8 @@ def get_related_questions():
 def get_rag_stats():
     """Get RAG database statistics"""
     try:
-        stats = rag_service.get_database_stats()
-        subject_stats = rag_service.get_subject_stats()
+        stats = get_rag_service().get_database_stats()
+        subject_stats = get_rag_service().get_subject_stats()
         stats['subject_stats'] = subject_stats
         return jsonify(stats)
     except Exception as e:
@@ -1308,7 +1315,7 @@ def multi_subject_search():
         if not query:
             return jsonify({'error': 'Query required'}), 400
         
-        results = rag_service.search_across_subjects(query, subjects)
+        results = get_rag_service().search_across_subjects(query, subjects)
         return jsonify(results)
         
     except Exception as e:
@@ -1,13 +1,60 @@
 import os
-import google.generativeai as genai
-from typing import List, Dict, Optional
+import importlib.util
 import json
-import requests
+import random
+import threading
+import time
+from typing import List, Dict, Optional, Tuple
+
+try:
+    # Faster JSON parsing of model responses; the stdlib parser is the fallback
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    import urllib.request
+    HTTPX_AVAILABLE = False
+
+# Upper bound on concurrent Gemini requests and retries on quota errors
+GEMINI_MAX_CONCURRENCY = 8
+GEMINI_MAX_RETRIES = 5
+
+# Shared keep-alive client so connectivity probes and REST calls reuse one TLS connection;
+# created on first use, with HTTP/2 only when the optional h2 package is installed
+_http_client = None
+_http_client_lock = threading.Lock()
+
+def _get_http_client() -> 'httpx.Client':
+    """Return the shared HTTP client, creating it on first call"""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    http2=importlib.util.find_spec("h2") is not None,
+                    timeout=3.0,
+                    limits=httpx.Limits(max_keepalive_connections=10)
+                )
+    return _http_client
+
+# Style rules sent once as the model's system instruction instead of in every prompt
+_STYLE_RULES = """
+You are a tutor for rural Indian students (grades 6-12).
+Write in simple, clear language and use examples relatable to the Indian context.
+Be educational and encouraging, in a natural, conversational style.
+Unless a JSON response is requested, reply in plain text without any markdown formatting,
+bullet points, asterisks (*), or special symbols.
+"""
 
 class LLMService:
     def __init__(self):
         print("🤖 Initializing LLM Service...")
         self.gemini_api_key = os.getenv('GEMINI_API_KEY')
+        self._gemini_semaphore = threading.BoundedSemaphore(GEMINI_MAX_CONCURRENCY)
         self.is_online = self._check_internet_connection()
         
         print(f"🔑 Gemini API Key available: {bool(self.gemini_api_key)}")
@@ -15,8 +62,13 @@ class LLMService:
         
         if self.gemini_api_key and self.is_online:
             try:
+                # Imported lazily: genai pulls in grpc/protobuf and is unused in offline mode
+                import google.generativeai as genai
                 genai.configure(api_key=self.gemini_api_key)
-                self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
+                self.model = genai.GenerativeModel(
+                    'gemini-2.0-flash-exp',
+                    system_instruction=_STYLE_RULES
+                )
                 print("✅ Gemini model initialized successfully")
             except Exception as e:
                 print(f"❌ Error initializing Gemini model: {e}")
@@ -29,40 +81,69 @@ class LLMService:
     
     def _check_internet_connection(self) -> bool:
         """Check if internet connection is available"""
+        if not HTTPX_AVAILABLE:
+            try:
+                urllib.request.urlopen(urllib.request.Request("https://www.google.com", method="HEAD"), timeout=3.0).close()
+                return True
+            except OSError:
+                return False
         try:
-            requests.get("https://www.google.com", timeout=3)
+            _get_http_client().head("https://www.google.com")
             return True
-        except:
+        except httpx.HTTPError:
             return False
     
+    def _call_gemini(self, prompt: str):
+        """Call Gemini with bounded concurrency and exponential backoff on rate limits"""
+        from google.api_core.exceptions import ResourceExhausted
+        
+        with self._gemini_semaphore:
+            for attempt in range(GEMINI_MAX_RETRIES):
+                try:
+                    return self.model.generate_content(prompt)
+                except ResourceExhausted:
+                    if attempt == GEMINI_MAX_RETRIES - 1:
+                        raise
+                    delay = 2 ** attempt + random.random()
+                    print(f"⏳ Gemini rate limit hit, retrying in {delay:.1f}s")
+                    time.sleep(delay)
+    
     def generate_questions_from_text(self, text: str, num_questions: int = 5, 
                                    question_type: str = "mcq", difficulty: str = "medium") -> List[Dict]:
         """
         Generate questions from extracted text using Gemini or fallback
         """
+        return self.generate_questions_with_source(text, num_questions, question_type, difficulty)[0]
+    
+    def generate_questions_with_source(self, text: str, num_questions: int = 5,
+                                       question_type: str = "mcq", difficulty: str = "medium") -> Tuple[List[Dict], bool]:
+        """
+        Generate questions from extracted text using Gemini or fallback
+        Returns: (questions, from_model), from_model is False for offline placeholder questions
+        """
         try:
             print(f"🤖 Generating {num_questions} {question_type} questions (difficulty: {difficulty})")
             print(f"📄 Text length: {len(text)} characters")
             
             if not text or len(text.strip()) < 100:
                 print("❌ Text too short for question generation")
-                return self._generate_offline_questions(text, num_questions, question_type, difficulty)
+                return self._generate_offline_questions(text, num_questions, question_type, difficulty), False
             
             if self.model and self.is_online:
                 print("🌐 Using Gemini API for question generation")
                 return self._generate_with_gemini(text, num_questions, question_type, difficulty)
             else:
                 print("📚 Using offline question generation")
-                return self._generate_offline_questions(text, num_questions, question_type, difficulty)
+                return self._generate_offline_questions(text, num_questions, question_type, difficulty), False
         except Exception as e:
             print(f"❌ Error generating questions: {e}")
             import traceback
             traceback.print_exc()
-            return self._generate_offline_questions(text, num_questions, question_type, difficulty)
+            return self._generate_offline_questions(text, num_questions, question_type, difficulty), False
     
     def _generate_with_gemini(self, text: str, num_questions: int, 
-                            question_type: str, difficulty: str = "medium") -> List[Dict]:
-        """Generate questions using Gemini API with difficulty control"""
+                            question_type: str, difficulty: str = "medium") -> Tuple[List[Dict], bool]:
+        """Generate questions using Gemini API with difficulty control; (questions, from_model)"""
         try:
             difficulty_instructions = {
                 "easy": "Generate basic recall questions that test fundamental concepts and definitions. Focus on simple facts and basic understanding.",
@@ -102,7 +183,7 @@ class LLMService:
             5. Make sure the answer field matches exactly one of the options
             """
             
-            response = self.model.generate_content(prompt)
+            response = self._call_gemini(prompt)
             try:
                 # Clean the response to remove markdown code blocks
                 response_text = response.text.strip()
@@ -120,17 +201,17 @@ class LLMService:
                 
                 print(f"🧹 Cleaned response text: {response_text[:200]}...")
                 
-                questions = json.loads(response_text)
+                questions = _json_loads(response_text)
                 print(f"✅ Successfully parsed {len(questions)} questions from JSON")
-                return questions[:num_questions]
+                return questions[:num_questions], True
             except json.JSONDecodeError as json_error:
                 print(f"JSON parsing error: {json_error}")
                 print(f"Response text: {response.text[:200]}...")
-                return self._generate_offline_questions(text, num_questions, question_type, difficulty)
+                return self._generate_offline_questions(text, num_questions, question_type, difficulty), False
             
         except Exception as e:
             print(f"Gemini API error: {e}")
-            return self._generate_offline_questions(text, num_questions, question_type, difficulty)
+            return self._generate_offline_questions(text, num_questions, question_type, difficulty), False
     
     def _generate_offline_questions(self, text: str, num_questions: int, 
                                   question_type: str, difficulty: str = "medium") -> List[Dict]:
@@ -175,14 +256,8 @@ class LLMService:
                 3. Key concepts and principles involved
                 4. Real-world examples or applications (if relevant)
                 5. Tips for remembering this concept
-                
-                Write in simple, clear language suitable for rural Indian students (grades 6-12).
-                Use examples that are relatable to Indian context.
-                IMPORTANT: Provide your explanation in plain text without any markdown formatting, 
-                bullet points, asterisks (*), or special symbols.
-                Keep the explanation educational and encouraging.
                 """
-                response = self.model.generate_content(prompt)
+                response = self._call_gemini(prompt)
                 
                 # Clean up the response to remove any remaining markdown
                 explanation = response.text
@@ -209,16 +284,8 @@ class LLMService:
         """Generate an answer based on a prompt"""
         if self.model and self.is_online:
             try:
-                # Add instructions to avoid markdown formatting
-                clean_prompt = f"""
-                {prompt}
-                
-                IMPORTANT: Provide your answer in plain text without any markdown formatting, 
-                bullet points, asterisks (*), or special symbols. Use simple, clear language 
-                suitable for rural Indian students. Write in a natural, conversational style.
-                """
-                
-                response = self.model.generate_content(clean_prompt)
+                # Plain-text style rules are applied via the model's system instruction
+                response = self._call_gemini(prompt)
                 
                 # Clean up the response to remove any remaining markdown
                 answer = response.text
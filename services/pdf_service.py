@@ -1,28 +1,24 @@
 import os
+from array import array
 from typing import List, Dict, Tuple, Optional
 import re
-from dataclasses import dataclass
 import json
 
-# Try to import PyMuPDF
-try:
-    import fitz  # PyMuPDF
-    PYMUPDF_AVAILABLE = True
-    print("✅ PyMuPDF (fitz) is available")
-except ImportError:
-    PYMUPDF_AVAILABLE = False
-    print("❌ PyMuPDF (fitz) is not available. Please install: pip install PyMuPDF")
+# PyMuPDF is imported on first use to keep worker start-up fast
+_fitz = None
 
-@dataclass
-class ContentSection:
-    """Represents a structured section of content"""
-    title: str
-    content: str
-    level: int  # 1=chapter, 2=topic, 3=subtopic
-    page_start: int
-    page_end: int
-    parent: Optional[str] = None
-    children: List[str] = None
+def _get_fitz():
+    """Import PyMuPDF once and cache it; returns None if it is not installed"""
+    global _fitz
+    if _fitz is None:
+        try:
+            import fitz  # PyMuPDF
+            _fitz = fitz
+            print("✅ PyMuPDF (fitz) is available")
+        except ImportError:
+            print("❌ PyMuPDF (fitz) is not available. Please install: pip install PyMuPDF")
+            return None
+    return _fitz
 
 class PDFService:
     def __init__(self):
@@ -34,7 +30,8 @@ class PDFService:
             print(f"📄 Starting PDF extraction for: {filepath}")
             
             # Check if PyMuPDF is available
-            if not PYMUPDF_AVAILABLE:
+            fitz = _get_fitz()
+            if fitz is None:
                 return {
                     'success': False,
                     'error': 'PyMuPDF is not available. Please install: pip install PyMuPDF'
@@ -52,7 +49,11 @@ class PDFService:
             print(f"✅ PDF opened successfully, pages: {len(doc)}")
             
             full_text = ""
-            structured_content = []
+            # Prefer the embedded outline; regex heading detection is only a fallback
+            section_titles, section_levels, section_pages = self._sections_from_toc(doc)
+            use_toc = bool(section_titles)
+            if use_toc:
+                print(f"📑 Using embedded table of contents: {len(section_titles)} entries")
             
             # Extract full text and detect structure
             for page_num in range(len(doc)):
@@ -61,11 +62,17 @@ class PDFService:
                     text = page.get_text()
                     full_text += text + "\n"
                     
+                    if use_toc:
+                        print(f"📄 Page {page_num + 1}: {len(text)} characters")
+                        continue
+                    
                     # Detect structured content on this page
-                    sections = self._detect_sections(text, page_num)
-                    structured_content.extend(sections)
+                    titles, levels, pages = self._detect_sections(text, page_num)
+                    section_titles.extend(titles)
+                    section_levels.extend(levels)
+                    section_pages.extend(pages)
                     
-                    print(f"📄 Page {page_num + 1}: {len(text)} characters, {len(sections)} sections")
+                    print(f"📄 Page {page_num + 1}: {len(text)} characters, {len(titles)} sections")
                     
                 except Exception as page_error:
                     print(f"⚠️ Error processing page {page_num + 1}: {page_error}")
@@ -75,7 +82,9 @@ class PDFService:
             print(f"📊 Total text extracted: {len(full_text)} characters")
             
             # Organize content hierarchy
-            organized_content = self._organize_content_hierarchy(structured_content)
+            organized_content = self._organize_content_hierarchy(
+                section_titles, section_levels, section_pages
+            )
             print(f"📊 Organized content sections: {len(organized_content.get('chapters', []))} chapters, {len(organized_content.get('topics', []))} topics")
             
             # Extract metadata and get page count before closing
@@ -121,6 +130,12 @@ class PDFService:
     
     def _detect_language(self, text: str) -> str:
         """Simple language detection based on character sets"""
+        # Script distribution is stable after the first few KB, so only sample a prefix.
+        # Fall back to the full text when the prefix is mostly whitespace (e.g. blank cover pages).
+        sample = text[:4096]
+        if len(''.join(sample.split())) >= 500:
+            text = sample
+
         # Count Devanagari characters (Hindi, Marathi, etc.)
         devanagari_chars = len(re.findall(r'[\u0900-\u097F]', text))
         
@@ -153,9 +168,40 @@ class PDFService:
         else:
             return 'en'  # Default to English
     
-    def _detect_sections(self, text: str, page_num: int) -> List[ContentSection]:
-        """Detect chapters, topics, and subtopics from text"""
-        sections = []
+    def _sections_from_toc(self, doc) -> Tuple[List[str], array, array]:
+        """
+        Build section columns from the PDF's embedded table of contents
+        Returns: (titles, levels, page_starts); empty columns if the PDF has no outline
+        """
+        titles = []
+        levels = array('b')
+        page_starts = array('i')
+        
+        try:
+            toc = doc.get_toc(simple=True)
+        except Exception as e:
+            print(f"⚠️ Could not read table of contents: {e}")
+            return titles, levels, page_starts
+        
+        for level, title, page in toc:
+            # Only chapter/topic/subtopic levels are tracked
+            if level > 3 or not title.strip():
+                continue
+            titles.append(title.strip())
+            levels.append(level)
+            # TOC pages are 1-based (-1 if unresolved); sections use 0-based page numbers
+            page_starts.append(max(page - 1, 0))
+        
+        return titles, levels, page_starts
+    
+    def _detect_sections(self, text: str, page_num: int) -> Tuple[List[str], array, array]:
+        """
+        Detect chapters, topics, and subtopics from text
+        Returns: (titles, levels, page_starts) as parallel columns
+        """
+        titles = []
+        levels = array('b')
+        page_starts = array('i')
         
         # Common patterns for section headers
         patterns = [
@@ -202,51 +248,45 @@ class PDFService:
                         # Fallback if regex groups don't match expected pattern
                         title = line
                     
-                    section = ContentSection(
-                        title=title.strip(),
-                        content="",
-                        level=level,
-                        page_start=page_num,
-                        page_end=page_num,
-                        children=[]
-                    )
-                    sections.append(section)
+                    titles.append(title.strip())
+                    levels.append(level)
+                    page_starts.append(page_num)
                     break
         
-        return sections
+        return titles, levels, page_starts
     
-    def _organize_content_hierarchy(self, sections: List[ContentSection]) -> Dict:
-        """Organize sections into a hierarchical structure"""
+    def _organize_content_hierarchy(self, titles: List[str], levels: array, page_starts: array) -> Dict:
+        """Organize section columns into a hierarchical structure"""
         hierarchy = {
             'chapters': [],
             'topics': [],
             'subtopics': []
         }
         
-        # Group by level
-        for section in sections:
-            if section.level == 1:
+        # Group by level; dicts are only materialized here at the output boundary
+        for title, level, page in zip(titles, levels, page_starts):
+            if level == 1:
                 hierarchy['chapters'].append({
                     'id': f"chapter_{len(hierarchy['chapters'])+1}",
-                    'title': section.title,
-                    'page_start': section.page_start,
-                    'page_end': section.page_end,
+                    'title': title,
+                    'page_start': page,
+                    'page_end': page,
                     'topics': []
                 })
-            elif section.level == 2:
+            elif level == 2:
                 hierarchy['topics'].append({
                     'id': f"topic_{len(hierarchy['topics'])+1}",
-                    'title': section.title,
-                    'page_start': section.page_start,
-                    'page_end': section.page_end,
+                    'title': title,
+                    'page_start': page,
+                    'page_end': page,
                     'subtopics': []
                 })
-            elif section.level == 3:
+            elif level == 3:
                 hierarchy['subtopics'].append({
                     'id': f"subtopic_{len(hierarchy['subtopics'])+1}",
-                    'title': section.title,
-                    'page_start': section.page_start,
-                    'page_end': section.page_end
+                    'title': title,
+                    'page_start': page,
+                    'page_end': page
                 })
         
         return hierarchy
@@ -254,12 +294,13 @@ class PDFService:
     def get_content_by_section(self, filepath: str, section_id: str) -> Dict:
         """Get content for a specific section"""
         try:
-            doc = fitz.open(filepath)
             result = self.extract_text_from_pdf(filepath)
             
             if not result['success']:
                 return result
             
+            doc = _get_fitz().open(filepath)
+            
             # Find the section
             section_content = ""
             for section_type, sections in result['structured_content'].items():
@@ -354,7 +395,8 @@ class PDFService:
         """
         try:
             # Check if PyMuPDF is available
-            if not PYMUPDF_AVAILABLE:
+            fitz = _get_fitz()
+            if fitz is None:
                 return False, "PyMuPDF is not available. Please install: pip install PyMuPDF"
             
             doc = fitz.open(filepath)
@@ -364,17 +406,16 @@ class PDFService:
                 doc.close()
                 return False, "PDF is password protected"
             
-            # Check if PDF has text content
-            text_content = ""
+            # Check if PDF has text content, stopping as soon as we have enough
+            total_chars = 0
             for page in doc:
-                text_content += page.get_text()
-            
+                total_chars += len(page.get_text().strip())
+                if total_chars >= 100:
+                    doc.close()
+                    return True, "PDF is valid"
+
             doc.close()
-            
-            if len(text_content.strip()) < 100:
-                return False, "PDF contains insufficient text content"
-            
-            return True, "PDF is valid"
+            return False, "PDF contains insufficient text content"
             
         except Exception as e:
             return False, f"Error validating PDF: {str(e)}"
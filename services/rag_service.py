@@ -1,19 +1,136 @@
 import os
+import re
 import json
 import hashlib
+import platform
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import List, Dict, Optional, Tuple
 import chromadb
+import torch
 from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
+from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
 import numpy as np
 from datetime import datetime
 
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+# Encode batch sizes; GPUs amortize larger padded batches better than CPUs
+EMBEDDING_BATCH_SIZE_CPU = 32
+EMBEDDING_BATCH_SIZE_GPU = 128
+# Intra-op threads for the embedding model; keeps concurrent requests from oversubscribing cores
+EMBEDDING_NUM_THREADS = int(os.getenv('RAG_TORCH_THREADS', '4'))
+# Optional model2vec static model for the query path. It must be distilled from
+# EMBEDDING_MODEL_NAME without PCA so queries land in the same 384-d space as stored chunks.
+QUERY_MODEL_NAME = os.getenv('RAG_QUERY_MODEL', '')
+# Maximum records per Chroma add() call when ingesting large PDFs
+CHROMA_ADD_BATCH_SIZE = 256
+# Cache sizes for repeated query embeddings and subject classifications
+QUERY_EMBEDDING_CACHE_SIZE = 2048
+SUBJECT_CACHE_SIZE = 256
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+
+# HNSW index settings: MiniLM embeddings are meant for cosine similarity, and
+# a larger search_ef gives better recall for the small top_k used here
+HNSW_SETTINGS = {
+    "hnsw:space": "cosine",
+    "hnsw:construction_ef": 200,
+    "hnsw:M": 32,
+    "hnsw:search_ef": 64
+}
+
+_SENTENCE_END_RE = re.compile(r'[.!?]')
+
+SUBJECT_KEYWORDS = {
+    'mathematics': ['equation', 'formula', 'calculate', 'solve', 'number', 'math', 'algebra', 'geometry', 'trigonometry'],
+    'science': ['experiment', 'hypothesis', 'theory', 'molecule', 'atom', 'chemical', 'physics', 'biology', 'chemistry'],
+    'history': ['ancient', 'century', 'war', 'king', 'queen', 'empire', 'civilization', 'historical', 'past'],
+    'geography': ['country', 'continent', 'ocean', 'mountain', 'river', 'climate', 'population', 'map', 'location'],
+    'english': ['grammar', 'literature', 'poem', 'novel', 'sentence', 'vocabulary', 'writing', 'reading'],
+    'hindi': ['हिंदी', 'कविता', 'कहानी', 'व्याकरण', 'साहित्य', 'भाषा']
+}
+
+# Keyword sets for whole-word matching (so e.g. 'king' does not match 'making')
+_SUBJECT_SETS = {
+    subject: frozenset(keyword.lower() for keyword in keywords)
+    for subject, keywords in SUBJECT_KEYWORDS.items()
+}
+# \w alone splits Devanagari words at vowel signs, so include the whole Devanagari block
+_TOKEN_RE = re.compile(r'[\w\u0900-\u097F]+')
+
+def _chunk_spans(text_len, sentence_ends, chunk_size, overlap):
+    """
+    Compute (start, end) spans of overlapping chunks, breaking at the last
+    sentence end within the final 100 chars of each chunk when possible
+    Returns: int64 array of shape (n_chunks, 2)
+    """
+    spans = np.empty((16, 2), dtype=np.int64)
+    count = 0
+    start = 0
+    
+    while start < text_len:
+        end = start + chunk_size
+        
+        if end < text_len:
+            lower = max(start + chunk_size - 100, start)
+            idx = np.searchsorted(sentence_ends, end + 1, side='right')
+            if idx > 0 and sentence_ends[idx - 1] > lower + 1:
+                end = sentence_ends[idx - 1]
+        
+        if count == spans.shape[0]:
+            grown = np.empty((count * 2, 2), dtype=np.int64)
+            grown[:count] = spans
+            spans = grown
+        spans[count, 0] = start
+        spans[count, 1] = end
+        count += 1
+        
+        start = end - overlap
+    
+    return spans[:count]
+
+# JIT-compile the span loop when numba is available; the plain function is the fallback
+try:
+    from numba import njit
+    _chunk_spans = njit(cache=True)(_chunk_spans)
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# BLAKE3 is SIMD-accelerated; fall back to stdlib BLAKE2b when it is not installed
+try:
+    from blake3 import blake3 as _blake3
+    
+    def _qa_hash(data: bytes) -> str:
+        return _blake3(data).hexdigest()[:32]
+except ImportError:
+    def _qa_hash(data: bytes) -> str:
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def _onnx_quantization_config() -> str:
+    """Pick the ONNX INT8 quantization target best supported by this CPU"""
+    if platform.machine().lower() in ('arm64', 'aarch64'):
+        return 'arm64'
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            cpu_flags = f.read()
+        if 'avx512_vnni' in cpu_flags or 'avx512vnni' in cpu_flags:
+            return 'avx512_vnni'
+    except OSError:
+        pass
+    return 'avx2'
+
 class RAGService:
-    def __init__(self, db_path: str = "vector_db"):
+    def __init__(self, db_path: str = "vector_db", model_cache_dir: str = None):
         """Initialize RAG service with vector database"""
         self.db_path = db_path
         os.makedirs(db_path, exist_ok=True)
         
+        # Quantized embedding model is exported once and cached next to the vector database
+        self.model_cache_dir = model_cache_dir or os.path.join(
+            os.path.dirname(os.path.abspath(db_path)), 'models', EMBEDDING_MODEL_NAME
+        )
+        
         # Initialize ChromaDB
         self.client = chromadb.PersistentClient(
             path=db_path,
@@ -22,41 +139,172 @@ class RAGService:
         
         # Initialize sentence transformer for embeddings
         try:
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            self.embedding_model = self._load_embedding_model()
+            on_gpu = str(self.embedding_model.device).startswith('cuda')
+            self.embedding_batch_size = EMBEDDING_BATCH_SIZE_GPU if on_gpu else EMBEDDING_BATCH_SIZE_CPU
+            # Pay graph initialization and thread-pool start-up now rather than on the first question
+            self.embedding_model.encode(["warmup"] * 2, batch_size=2, show_progress_bar=False)
             print("✅ RAG Service: Embedding model loaded successfully")
         except Exception as e:
             print(f"❌ RAG Service: Failed to load embedding model: {e}")
             print("⚠️  RAG Service: Running in fallback mode without embeddings")
             self.embedding_model = None
         
+        self.query_model = self._load_query_model() if self.embedding_model else None
+        
         # Get or create collections
-        self.content_collection = self.client.get_or_create_collection(
-            name="curriculum_content",
-            metadata={"description": "Curriculum content chunks for RAG"}
+        self.questions_collection = self._get_or_create_collection(
+            "student_questions", "Student questions and answers"
         )
         
-        self.questions_collection = self.client.get_or_create_collection(
-            name="student_questions",
-            metadata={"description": "Student questions and answers"}
+        # Subjects are a metadata field on the unified collection rather than separate collections
+        self.subjects = ['mathematics', 'science', 'history', 'geography', 'english', 'hindi']
+        
+        # Unified knowledge base collection (single canonical store for all content chunks)
+        self.unified_collection = self._get_or_create_collection(
+            "unified_knowledge", "Unified knowledge base across all subjects"
         )
+        self._migrate_subject_collections()
         
-        # Multi-subject collections
-        self.subject_collections = {}
-        self.subjects = ['mathematics', 'science', 'history', 'geography', 'english', 'hindi']
+        # Per-instance memoization; classroom traffic repeats the same doubts often
+        self._embed_query_cached = lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)(self._embed_query)
+        self.classify_subject = lru_cache(maxsize=SUBJECT_CACHE_SIZE)(self.classify_subject)
         
-        for subject in self.subjects:
-            self.subject_collections[subject] = self.client.get_or_create_collection(
-                name=f"subject_{subject}",
-                metadata={"description": f"{subject.title()} content chunks"}
+        print("✅ RAG Service: Vector database initialized")
+    
+    def _get_or_create_collection(self, name: str, description: str):
+        """Get or create a collection with the tuned HNSW index settings, rebuilding one created without them"""
+        metadata = {"description": description, **HNSW_SETTINGS}
+        rebuild_name = f"{name}_rebuild"
+        existing = {getattr(c, 'name', c) for c in self.client.list_collections()}
+        if name not in existing and rebuild_name in existing:
+            # A rebuild was interrupted after the old collection was dropped; finish it
+            self.client.get_collection(name=rebuild_name).modify(name=name)
+        
+        # An existing collection is returned as-is, so check what index it actually has
+        collection = self.client.get_or_create_collection(name=name, metadata=metadata)
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        if space == HNSW_SETTINGS["hnsw:space"]:
+            return collection
+        
+        # Chroma cannot change the index of an existing collection, so rebuild it
+        if collection.count() == 0:
+            self.client.delete_collection(name=name)
+            print(f"✅ RAG Service: Recreated empty {name} with a {HNSW_SETTINGS['hnsw:space']} index")
+            return self.client.create_collection(name=name, metadata=metadata)
+        
+        print(f"🔧 RAG Service: Rebuilding {name} ({collection.count()} chunks) from a {space} to a "
+              f"{HNSW_SETTINGS['hnsw:space']} index...")
+        if rebuild_name in existing:
+            self.client.delete_collection(name=rebuild_name)
+        rebuilt = self.client.create_collection(name=rebuild_name, metadata=metadata)
+        # Stored embeddings are already normalized, so they are copied rather than re-encoded
+        self._copy_collection(collection, rebuilt)
+        if rebuilt.count() != collection.count():
+            raise RuntimeError(f"Rebuilding {name} copied {rebuilt.count()} of {collection.count()} chunks")
+        self.client.delete_collection(name=name)
+        rebuilt.modify(name=name)
+        print(f"✅ RAG Service: Rebuilt {name}")
+        return rebuilt
+    
+    def _copy_collection(self, source, target, subject: str = None):
+        """Upsert every record of source into target in batches, optionally tagging each with a subject"""
+        offset = 0
+        while True:
+            batch = source.get(limit=CHROMA_ADD_BATCH_SIZE, offset=offset,
+                               include=['documents', 'embeddings', 'metadatas'])
+            if not batch['ids']:
+                return
+            metadatas = [dict(meta or {}) for meta in batch['metadatas']]
+            if subject:
+                for meta in metadatas:
+                    meta['subject'] = subject
+            target.upsert(
+                ids=batch['ids'],
+                documents=batch['documents'],
+                embeddings=batch['embeddings'],
+                metadatas=metadatas
             )
+            offset += len(batch['ids'])
+    
+    def _migrate_subject_collections(self):
+        """One-time move of the old subject_<name> collections into the unified collection"""
+        existing = {getattr(c, 'name', c) for c in self.client.list_collections()}
+        for subject in self.subjects:
+            name = f"subject_{subject}"
+            if name not in existing:
+                continue
+            try:
+                # Upsert also fills in any chunk whose unified write failed back then
+                self._copy_collection(self.client.get_collection(name=name), self.unified_collection, subject)
+                self.client.delete_collection(name=name)
+                print(f"✅ RAG Service: Migrated {name} into unified_knowledge")
+            except Exception as e:
+                # The old collection is kept, so the next start retries
+                print(f"⚠️  RAG Service: Could not migrate {name}: {e}")
+    
+    def _load_embedding_model(self) -> SentenceTransformer:
+        """Load the embedding model: half-precision PyTorch on GPU, otherwise INT8-quantized ONNX on CPU"""
+        if torch.cuda.is_available():
+            model = SentenceTransformer(EMBEDDING_MODEL_NAME, device='cuda')
+            # FP16 only pays off on tensor-core GPUs (compute capability 7.0+)
+            if torch.cuda.get_device_capability()[0] >= 7:
+                model = model.half()
+                print("✅ RAG Service: Using FP16 embeddings on GPU")
+            else:
+                print("✅ RAG Service: Using FP32 embeddings on GPU")
+            return model
         
-        # Unified knowledge base collection
-        self.unified_collection = self.client.get_or_create_collection(
-            name="unified_knowledge",
-            metadata={"description": "Unified knowledge base across all subjects"}
-        )
+        quantization = _onnx_quantization_config()
+        onnx_file = f"onnx/model_qint8_{quantization}.onnx"
         
-        print("✅ RAG Service: Vector database initialized")
+        torch.set_num_threads(EMBEDDING_NUM_THREADS)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Can only be set before any inter-op parallel work has started
+            pass
+        
+        try:
+            import onnxruntime
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = EMBEDDING_NUM_THREADS
+            session_options.inter_op_num_threads = 1
+            
+            if not os.path.exists(os.path.join(self.model_cache_dir, onnx_file)):
+                print(f"🔧 RAG Service: Exporting {quantization} INT8 ONNX embedding model...")
+                model = SentenceTransformer(EMBEDDING_MODEL_NAME, backend='onnx')
+                model.save(self.model_cache_dir)
+                export_dynamic_quantized_onnx_model(model, quantization, self.model_cache_dir)
+            
+            model = SentenceTransformer(
+                self.model_cache_dir,
+                backend='onnx',
+                model_kwargs={'file_name': onnx_file, 'session_options': session_options}
+            )
+            print(f"✅ RAG Service: Using ONNX INT8 ({quantization}) embeddings")
+            return model
+        except Exception as e:
+            print(f"⚠️  RAG Service: ONNX embedding model unavailable ({e}), using PyTorch model")
+            return SentenceTransformer(EMBEDDING_MODEL_NAME)
+    
+    def _load_query_model(self):
+        """Load the optional model2vec static query encoder; returns None if not configured or unusable"""
+        if not QUERY_MODEL_NAME:
+            return None
+        try:
+            from model2vec import StaticModel
+            query_model = StaticModel.from_pretrained(QUERY_MODEL_NAME)
+            dim = query_model.encode(["warmup"]).shape[1]
+            if dim != EMBEDDING_DIM:
+                print(f"⚠️  RAG Service: Query model {QUERY_MODEL_NAME} is {dim}-d, expected {EMBEDDING_DIM}-d; ignoring it")
+                return None
+            # Static token averaging trades a little recall for a much faster query path
+            print(f"✅ RAG Service: Using model2vec query encoder {QUERY_MODEL_NAME}")
+            return query_model
+        except Exception as e:
+            print(f"⚠️  RAG Service: Could not load query model {QUERY_MODEL_NAME}: {e}")
+            return None
     
     def extract_and_chunk_text(self, text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
         """Extract text chunks with overlap for better context"""
@@ -67,43 +315,76 @@ class RAGService:
         text = text.replace('\n', ' ').replace('\r', ' ')
         text = ' '.join(text.split())  # Remove extra whitespace
         
-        chunks = []
-        start = 0
+        # Offsets just past every sentence ending, computed once for the whole text
+        sentence_ends = np.fromiter(
+            (m.end() for m in _SENTENCE_END_RE.finditer(text)), dtype=np.int64
+        )
         
-        while start < len(text):
-            end = start + chunk_size
-            
-            # Try to break at sentence boundary
-            if end < len(text):
-                # Look for sentence endings
-                for i in range(end, max(start + chunk_size - 100, start), -1):
-                    if text[i] in '.!?':
-                        end = i + 1
-                        break
-            
+        chunks = []
+        for start, end in _chunk_spans(len(text), sentence_ends, chunk_size, overlap):
             chunk = text[start:end].strip()
             if chunk:
                 chunks.append(chunk)
-            
-            start = end - overlap
-            if start >= len(text):
-                break
         
         return chunks
     
-    def create_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Create embeddings for text chunks"""
+    def create_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Create embeddings for text chunks as a (len(texts), EMBEDDING_DIM) float32 array"""
         if not self.embedding_model:
             # Return dummy embeddings if model is not loaded
             print("⚠️  RAG Service: Using dummy embeddings (model not loaded)")
-            return [[0.0] * 384 for _ in texts]  # 384 is the dimension of all-MiniLM-L6-v2
+            return np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
         
         try:
-            embeddings = self.embedding_model.encode(texts, convert_to_tensor=False)
-            return embeddings.tolist()
+            # Encode in length order so each padded batch holds similarly sized texts
+            order = np.argsort([len(t) for t in texts], kind='stable')
+            embeddings = self.embedding_model.encode(
+                [texts[i] for i in order],
+                batch_size=self.embedding_batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+            
+            # Restore the caller's order
+            inverse = np.empty_like(order)
+            inverse[order] = np.arange(len(order))
+            return embeddings[inverse].astype(np.float32, copy=False)
         except Exception as e:
             print(f"❌ Error creating embeddings: {e}")
-            return []
+            return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+    
+    def _add_in_batches(self, collection, documents: List[str], embeddings, metadatas: List[Dict],
+                        ids: List[str], batch_size: int = CHROMA_ADD_BATCH_SIZE):
+        """Add records to a collection in size-capped batches to bound memory per request"""
+        for i in range(0, len(ids), batch_size):
+            collection.add(
+                documents=documents[i:i + batch_size],
+                embeddings=embeddings[i:i + batch_size],
+                metadatas=metadatas[i:i + batch_size],
+                ids=ids[i:i + batch_size]
+            )
+    
+    def _embed_query(self, normalized_query: str) -> np.ndarray:
+        """Embed a single normalized query as a (1, EMBEDDING_DIM) array; wrapped by an LRU cache in __init__"""
+        if self.query_model is not None:
+            embedding = self.query_model.encode([normalized_query]).astype(np.float32)
+            embedding /= np.linalg.norm(embedding, axis=1, keepdims=True) + 1e-12
+        else:
+            embedding = self.embedding_model.encode(
+                [normalized_query],
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            ).astype(np.float32, copy=False)
+        # Cached arrays are shared between callers, so make them immutable
+        embedding.setflags(write=False)
+        return embedding
+    
+    def _chunk_id(self, pdf_filename: str, chunk: str) -> str:
+        """Deterministic chunk ID from the source file and chunk text"""
+        # Scoped to the file so delete_pdf_content and source attribution stay per-PDF
+        return hashlib.blake2b(f"{pdf_filename}\0{chunk}".encode('utf-8'), digest_size=16).hexdigest()
     
     def add_pdf_content(self, pdf_filename: str, text: str, metadata: Dict = None, subject: str = None) -> bool:
         """Add PDF content to vector database with subject classification"""
@@ -114,31 +395,49 @@ class RAGService:
                 print(f"❌ No text chunks extracted from {pdf_filename}")
                 return False
             
+            # Deterministic content-hash IDs make re-ingesting the same PDF idempotent;
+            # repeated chunks within the PDF keep their first occurrence
+            chunk_indices = {}
+            for i, chunk in enumerate(chunks):
+                chunk_indices.setdefault(self._chunk_id(pdf_filename, chunk), i)
+            
+            # Only embed chunks that are not already stored
+            existing_ids = set(self.unified_collection.get(ids=list(chunk_indices), include=[])['ids'])
+            new_chunks = [(chunk_id, i) for chunk_id, i in chunk_indices.items() if chunk_id not in existing_ids]
+            if not new_chunks:
+                print(f"ℹ️ All {len(chunk_indices)} chunks from {pdf_filename} are already indexed")
+                return True
+            
             # Create embeddings
             try:
-                embeddings = self.create_embeddings(chunks)
-                if not embeddings:
+                embeddings = self.create_embeddings([chunks[i] for _, i in new_chunks])
+                if len(embeddings) == 0:
                     print(f"❌ Failed to create embeddings for {pdf_filename}")
                     return False
             except Exception as emb_error:
                 print(f"⚠️  Embedding creation failed, using dummy embeddings: {emb_error}")
-                embeddings = [[0.0] * 384 for _ in chunks]  # Fallback embeddings
+                embeddings = np.zeros((len(new_chunks), EMBEDDING_DIM), dtype=np.float32)  # Fallback embeddings
+            
+            # Content without a recognised subject is only reachable through unfiltered search
+            subject_tag = subject.lower() if subject and subject.lower() in self.subjects else 'general'
             
-            # Prepare documents for storage
+            # Prepare documents for storage; all chunks of one ingest share a timestamp
             documents = []
             metadatas = []
             ids = []
+            now_iso = datetime.now().isoformat()
             
-            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                chunk_id = f"{pdf_filename}_chunk_{i}"
+            for chunk_id, i in new_chunks:
+                chunk = chunks[i]
                 
                 # Create metadata
                 chunk_metadata = {
                     "pdf_filename": pdf_filename,
                     "chunk_index": i,
                     "chunk_size": len(chunk),
-                    "timestamp": datetime.now().isoformat(),
-                    "source": "pdf_upload"
+                    "timestamp": now_iso,
+                    "source": "pdf_upload",
+                    "subject": subject_tag
                 }
                 
                 if metadata:
@@ -148,61 +447,40 @@ class RAGService:
                 metadatas.append(chunk_metadata)
                 ids.append(chunk_id)
             
-            # Add to main collection
-            try:
-                self.content_collection.add(
-                    documents=documents,
-                    embeddings=embeddings,
-                    metadatas=metadatas,
-                    ids=ids
-                )
-            except Exception as e:
-                print(f"⚠️  Failed to add to main collection: {e}")
-            
-            # Add to subject-specific collection if subject is specified
-            if subject and subject.lower() in self.subjects:
-                try:
-                    subject_collection = self.subject_collections[subject.lower()]
-                    subject_collection.add(
-                        documents=documents,
-                        embeddings=embeddings,
-                        metadatas=metadatas,
-                        ids=ids
-                    )
-                    print(f"✅ Added to {subject} collection")
-                except Exception as e:
-                    print(f"⚠️  Failed to add to {subject} collection: {e}")
-            
             # Add to unified knowledge base
             try:
-                self.unified_collection.add(
-                    documents=documents,
-                    embeddings=embeddings,
-                    metadatas=metadatas,
-                    ids=ids
-                )
+                self._add_in_batches(self.unified_collection, documents, embeddings, metadatas, ids)
             except Exception as e:
                 print(f"⚠️  Failed to add to unified collection: {e}")
             
-            print(f"✅ Added {len(chunks)} chunks from {pdf_filename} to vector database")
+            print(f"✅ Added {len(ids)} new chunks from {pdf_filename} to vector database")
             return True
             
         except Exception as e:
             print(f"❌ Error adding PDF content: {e}")
             return False
     
-    def search_relevant_content(self, query: str, top_k: int = 5, filter_metadata: Dict = None, subject: str = None) -> List[Dict]:
-        """Search for relevant content based on student query with optional subject filtering"""
+    def _build_where(self, filter_metadata: Optional[Dict], extra: Dict) -> Dict:
+        """Combine a caller-supplied Chroma filter with extra equality conditions"""
+        conditions = [{key: value} for key, value in (filter_metadata or {}).items()]
+        conditions.extend({key: value} for key, value in extra.items())
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+    
+    def search_relevant_content(self, query: str, top_k: int = 5, filter_metadata: Dict = None, subject: str = None,
+                                query_embedding: np.ndarray = None) -> List[Dict]:
+        """Search for relevant content based on student query with optional subject filtering
+        (pass query_embedding to reuse an already computed embedding)"""
         try:
             if not self.embedding_model:
                 raise Exception("Embedding model not loaded")
             
-            # Choose collection based on subject
+            # All content lives in the unified collection; subjects are a metadata filter
+            collection = self.unified_collection
+            where = filter_metadata
             if subject and subject.lower() in self.subjects:
-                collection = self.subject_collections[subject.lower()]
-                print(f"🔍 Searching in {subject} collection")
+                where = self._build_where(filter_metadata, {"subject": subject.lower()})
+                print(f"🔍 Searching {subject} content in unified knowledge base")
             else:
-                collection = self.unified_collection
                 print(f"🔍 Searching in unified knowledge base")
             
             # Check if we have any content in the database
@@ -211,16 +489,15 @@ class RAGService:
                 print("ℹ️ No content available in selected collection")
                 return []
             
-            # Create query embedding
-            query_embedding = self.create_embeddings([query])
-            if not query_embedding:
-                return []
+            # Create query embedding (cached by normalized query text)
+            if query_embedding is None:
+                query_embedding = self._embed_query_cached(' '.join(query.lower().split()))
             
             # Search in collection
             results = collection.query(
                 query_embeddings=query_embedding,
                 n_results=top_k,
-                where=filter_metadata
+                where=where
             )
             
             # Format results
@@ -284,7 +561,10 @@ class RAGService:
             sources = [chunk['metadata'].get('pdf_filename', 'Unknown') for chunk in context_chunks]
             
             # Calculate confidence based on relevance scores
-            avg_distance = np.mean([chunk['distance'] for chunk in context_chunks])
+            distances = np.fromiter(
+                (chunk['distance'] for chunk in context_chunks), dtype=np.float32, count=len(context_chunks)
+            )
+            avg_distance = float(distances.mean())
             confidence = max(0.1, 1.0 - avg_distance)  # Higher distance = lower confidence
             
             # If confidence is too low, fall back to general knowledge
@@ -385,14 +665,15 @@ Answer:"""
     def save_question_answer(self, question: str, answer: Dict, user_id: str) -> bool:
         """Save question-answer pair for future reference"""
         try:
-            qa_id = hashlib.md5(f"{user_id}_{question}_{datetime.now().isoformat()}".encode()).hexdigest()
+            now_iso = datetime.now().isoformat()
+            qa_id = _qa_hash(f"{user_id}_{question}_{now_iso}".encode())
             
             self.questions_collection.add(
                 documents=[question],
                 metadatas=[{
                     'user_id': user_id,
                     'answer': json.dumps(answer),
-                    'timestamp': datetime.now().isoformat(),
+                    'timestamp': now_iso,
                     'question_type': 'student_doubt'
                 }],
                 ids=[qa_id]
@@ -407,21 +688,22 @@ Answer:"""
     def get_user_question_history(self, user_id: str, limit: int = 10) -> List[Dict]:
         """Get user's question history"""
         try:
-            results = self.questions_collection.query(
-                query_texts=[""],  # Empty query to get all
-                n_results=limit,
-                where={"user_id": user_id}
+            # Plain metadata lookup; no embedding or similarity search needed
+            results = self.questions_collection.get(
+                where={"user_id": user_id},
+                limit=limit,
+                include=["documents", "metadatas"]
             )
             
             history = []
-            if results['documents'] and results['documents'][0]:
-                for i, doc in enumerate(results['documents'][0]):
-                    metadata = results['metadatas'][0][i] if results['metadatas'] and results['metadatas'][0] else {}
+            if results['documents']:
+                for i, doc in enumerate(results['documents']):
+                    metadata = results['metadatas'][i] if results['metadatas'] else {}
                     history.append({
                         'question': doc,
                         'answer': json.loads(metadata.get('answer', '{}')),
                         'timestamp': metadata.get('timestamp', ''),
-                        'id': results['ids'][0][i] if results['ids'] and results['ids'][0] else None
+                        'id': results['ids'][i] if results['ids'] else None
                     })
             
             return history
@@ -434,16 +716,15 @@ Answer:"""
         """Delete all content chunks for a specific PDF"""
         try:
             # Get all documents for this PDF
-            results = self.content_collection.query(
-                query_texts=[""],
-                n_results=1000,
-                where={"pdf_filename": pdf_filename}
+            results = self.unified_collection.get(
+                where={"pdf_filename": pdf_filename},
+                include=[]
             )
             
-            if results['ids'] and results['ids'][0]:
+            if results['ids']:
                 # Delete by IDs
-                self.content_collection.delete(ids=results['ids'][0])
-                print(f"✅ Deleted {len(results['ids'][0])} chunks for {pdf_filename}")
+                self.unified_collection.delete(ids=results['ids'])
+                print(f"✅ Deleted {len(results['ids'])} chunks for {pdf_filename}")
                 return True
             
             return False
@@ -455,13 +736,13 @@ Answer:"""
     def get_database_stats(self) -> Dict:
         """Get vector database statistics"""
         try:
-            content_count = self.content_collection.count()
+            content_count = self.unified_collection.count()
             questions_count = self.questions_collection.count()
             
             return {
                 'total_content_chunks': content_count,
                 'total_questions': questions_count,
-                'embedding_model': 'all-MiniLM-L6-v2' if self.embedding_model else 'Not loaded',
+                'embedding_model': EMBEDDING_MODEL_NAME if self.embedding_model else 'Not loaded',
                 'database_path': self.db_path
             }
             
@@ -470,13 +751,13 @@ Answer:"""
             return {}
     
     def get_subject_stats(self) -> Dict:
-        """Get statistics for each subject collection"""
+        """Get chunk counts for each subject in the unified collection"""
         stats = {}
         for subject in self.subjects:
-            collection = self.subject_collections[subject]
+            subject_chunks = self.unified_collection.get(where={"subject": subject}, include=[])
             stats[subject] = {
-                'chunks': collection.count(),
-                'collection_name': f"subject_{subject}"
+                'chunks': len(subject_chunks['ids']),
+                'collection_name': 'unified_knowledge'
             }
         
         # Add unified collection stats
@@ -493,11 +774,22 @@ Answer:"""
             subjects = self.subjects
         
         all_results = {}
+        valid_subjects = [subject for subject in subjects if subject.lower() in self.subjects]
         
-        for subject in subjects:
-            if subject.lower() in self.subjects:
-                results = self.search_relevant_content(query, top_k, subject=subject)
-                all_results[subject] = results
+        if valid_subjects and self.embedding_model:
+            # Embed once, then run the per-subject queries concurrently
+            query_embedding = self._embed_query_cached(' '.join(query.lower().split()))
+            with ThreadPoolExecutor(max_workers=len(valid_subjects)) as executor:
+                futures = {
+                    subject: executor.submit(
+                        self.search_relevant_content, query, top_k,
+                        subject=subject, query_embedding=query_embedding
+                    )
+                    for subject in valid_subjects
+                }
+                all_results = {subject: future.result() for subject, future in futures.items()}
+        else:
+            all_results = {subject: [] for subject in valid_subjects}
         
         # Combine and rank results
         combined_results = []
@@ -506,39 +798,42 @@ Answer:"""
                 result['subject'] = subject
                 combined_results.append(result)
         
-        # Sort by distance (lower is better)
-        combined_results.sort(key=lambda x: x.get('distance', 1.0))
+        # Sort by distance (lower is better), keeping only the top_k
+        distances = np.fromiter(
+            (result.get('distance', 1.0) for result in combined_results), dtype=np.float32, count=len(combined_results)
+        )
+        combined_results = [combined_results[i] for i in np.argsort(distances, kind='stable')[:top_k]]
         
         return {
             'query': query,
             'subjects_searched': subjects,
-            'results': combined_results[:top_k],
+            'results': combined_results,
             'subject_breakdown': {subject: len(results) for subject, results in all_results.items()}
         }
     
     def classify_subject(self, text: str) -> str:
         """Classify the subject of a text based on keywords"""
-        subject_keywords = {
-            'mathematics': ['equation', 'formula', 'calculate', 'solve', 'number', 'math', 'algebra', 'geometry', 'trigonometry'],
-            'science': ['experiment', 'hypothesis', 'theory', 'molecule', 'atom', 'chemical', 'physics', 'biology', 'chemistry'],
-            'history': ['ancient', 'century', 'war', 'king', 'queen', 'empire', 'civilization', 'historical', 'past'],
-            'geography': ['country', 'continent', 'ocean', 'mountain', 'river', 'climate', 'population', 'map', 'location'],
-            'english': ['grammar', 'literature', 'poem', 'novel', 'sentence', 'vocabulary', 'writing', 'reading'],
-            'hindi': ['हिंदी', 'कविता', 'कहानी', 'व्याकरण', 'साहित्य', 'भाषा']
-        }
-        
-        text_lower = text.lower()
-        subject_scores = {}
-        
-        for subject, keywords in subject_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in text_lower)
-            subject_scores[subject] = score
+        # One tokenization pass, then a small set intersection per subject
+        tokens = set(_TOKEN_RE.findall(text.lower()))
+        subject_scores = {subject: len(tokens & keywords) for subject, keywords in _SUBJECT_SETS.items()}
         
         # Return subject with highest score
-        if subject_scores:
-            return max(subject_scores, key=subject_scores.get)
+        best_subject = max(subject_scores, key=subject_scores.get)
+        if subject_scores[best_subject] > 0:
+            return best_subject
         
         return 'general'  # Default if no clear subject
 
-# Global instance
-rag_service = RAGService("../vector_db") 
\ No newline at end of file
+# Global instance, created on first use so importing this module stays cheap
+_rag_service = None
+_rag_service_lock = threading.Lock()
+
+def get_rag_service() -> RAGService:
+    """Return the shared RAG service, creating it on first call"""
+    global _rag_service
+    if _rag_service is None:
+        # Concurrent first requests must not each open a Chroma client and load the embedding model
+        with _rag_service_lock:
+            if _rag_service is None:
+                _rag_service = RAGService(os.getenv("RAG_DB_PATH", "../vector_db"))
+    return _rag_service
@@ -4,15 +4,186 @@ Teacher Mode System
 Allows teachers to manage classes, upload materials, and generate question papers
 """
 
-import json
+import atexit
+import hashlib
+import mmap
 import os
+import threading
 import uuid
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, get_origin
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from dataclasses import dataclass, asdict
+from dataclasses import MISSING, dataclass, asdict, fields, is_dataclass
 import random
 
-@dataclass
+try:
+    import orjson
+    
+    def _json_dumps(obj) -> bytes:
+        """Serialize to JSON bytes; orjson handles dataclasses and datetime (ISO 8601) natively"""
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    
+    _json_loads = orjson.loads
+except ImportError:
+    import json
+    
+    def _json_default(obj):
+        """Convert the dataclasses and datetimes the stdlib encoder cannot serialize"""
+        if is_dataclass(obj):
+            return asdict(obj)
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    
+    def _json_dumps(obj) -> bytes:
+        """Serialize to JSON bytes with the stdlib encoder"""
+        return (json.dumps(obj, default=_json_default, ensure_ascii=False) + "\n").encode('utf-8')
+    
+    def _json_loads(data):
+        """Parse JSON from bytes or a memoryview with the stdlib decoder"""
+        return json.loads(bytes(data))
+
+if TYPE_CHECKING:
+    from .llm_service import LLMService
+    from .pdf_service import PDFService
+
+# Extracted PDF text, keyed by the SHA-256 of the file contents
+PDF_TEXT_CACHE_DIR = "../cache/pdf_text"
+
+# Generated questions, keyed by content + generation settings; bump PROMPT_VERSION when prompts change
+LLM_QUESTION_CACHE_DIR = "../cache/llm_questions"
+PROMPT_VERSION = "v1"
+
+# Option labels for MCQs (A, B, C, ...)
+_OPTION_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# HTML templates for exported question papers
+_HTML_TEMPLATE = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>{title}</title>
+            <style>
+                body {{ font-family: Arial, sans-serif; margin: 40px; }}
+                .header {{ text-align: center; border-bottom: 2px solid #333; padding-bottom: 20px; margin-bottom: 30px; }}
+                .instructions {{ background-color: #f5f5f5; padding: 15px; margin-bottom: 30px; border-radius: 5px; }}
+                .question {{ margin-bottom: 25px; }}
+                .question-number {{ font-weight: bold; color: #333; }}
+                .options {{ margin-left: 20px; }}
+                .option {{ margin: 5px 0; }}
+                .footer {{ margin-top: 50px; text-align: center; font-size: 12px; color: #666; }}
+            </style>
+        </head>
+        <body>
+            <div class="header">
+                <h1>{title}</h1>
+                <p><strong>Subject:</strong> {subject}</p>
+                <p><strong>Total Marks:</strong> {total_marks} | <strong>Duration:</strong> {duration_minutes} minutes</p>
+            </div>
+            
+            <div class="instructions">
+                <h3>Instructions:</h3>
+                <p>{instructions}</p>
+            </div>
+            
+            <div class="questions">
+        {questions_html}
+            </div>
+            
+            <div class="footer">
+                <p>Generated by AI Tutor for Rural India</p>
+                <p>Date: {date}</p>
+            </div>
+        </body>
+        </html>
+        """
+
+_HTML_QUESTION_HEADER = """
+                <div class="question">
+                    <div class="question-number">Q{number}. """
+
+_HTML_QUESTION_OPTIONS_OPEN = """</div>
+                    <div class="options">
+            """
+
+# Question headers for the first 200 numbers, rendered once at import
+_QUESTION_HEADERS = [_HTML_QUESTION_HEADER.format(number=i) for i in range(1, 201)]
+
+_HTML_QUESTION_CLOSE = """
+                    </div>
+                </div>
+            """
+
+# Write-behind persistence: flush after this many seconds, or sooner once this many items are dirty
+FLUSH_INTERVAL_SECONDS = 2.0
+FLUSH_MAX_PENDING = 50
+
+# Sibling services, imported on first use (they load models/clients at import time)
+_llm_service = None
+_pdf_service = None
+
+def _get_llm_service() -> 'LLMService':
+    """Import the shared LLM service on first use"""
+    global _llm_service
+    if _llm_service is None:
+        from .llm_service import llm_service as _llm_service
+    return _llm_service
+
+def _get_pdf_service() -> 'PDFService':
+    """Import the shared PDF service on first use"""
+    global _pdf_service
+    if _pdf_service is None:
+        from .pdf_service import pdf_service as _pdf_service
+    return _pdf_service
+
+def _file_sha256(filepath: str) -> str:
+    """Hash a file without loading it into memory"""
+    with open(filepath, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):  # Python 3.11+
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+        digest = hashlib.sha256()
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+        return digest.hexdigest()
+
+def _join_unique_blocks(texts: List[Optional[str]]) -> str:
+    """Join extracted texts, dropping paragraphs already seen verbatim (repeated boilerplate, duplicate uploads)"""
+    seen = set()
+    blocks = []
+    for text in texts:
+        if text is None:
+            continue
+        for block in text.split("\n\n"):
+            key = hashlib.blake2b(block.strip().encode('utf-8'), digest_size=16).digest()
+            if key not in seen:
+                seen.add(key)
+                blocks.append(block)
+    return "".join(block + "\n\n" for block in blocks)
+
+def _record_kwargs(cls, data: Dict) -> Dict:
+    """
+    Constructor arguments for a dataclass from a stored JSON record: unknown keys are
+    dropped, missing fields get their default (or the empty value of their type), and
+    ISO timestamps and lists are converted back to datetime and tuple fields
+    """
+    kwargs = {}
+    for f in fields(cls):
+        kind = get_origin(f.type) or f.type
+        if f.name not in data:
+            if f.default is not MISSING:
+                kwargs[f.name] = f.default
+            else:
+                kwargs[f.name] = datetime.now() if kind is datetime else kind()
+        elif kind is datetime:
+            kwargs[f.name] = datetime.fromisoformat(data[f.name])
+        elif kind is tuple:
+            kwargs[f.name] = tuple(data[f.name])
+        else:
+            kwargs[f.name] = data[f.name]
+    return kwargs
+
+@dataclass(slots=True)
 class Class:
     """Represents a class managed by a teacher"""
     class_id: str
@@ -24,8 +195,13 @@ class Class:
     materials: List[str]  # List of uploaded PDF filenames
     created_date: datetime
     last_activity: datetime
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Class':
+        """Build from a deserialized JSON record"""
+        return cls(**_record_kwargs(cls, data))
 
-@dataclass
+@dataclass(slots=True)
 class QuestionPaper:
     """Represents a generated question paper"""
     paper_id: str
@@ -38,8 +214,14 @@ class QuestionPaper:
     difficulty_distribution: Dict[str, int]  # easy: count, medium: count, hard: count
     created_date: datetime
     instructions: str
+    source_pdf: str = ""  # Set when generated from an uploaded PDF
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'QuestionPaper':
+        """Build from a deserialized JSON record"""
+        return cls(**_record_kwargs(cls, data))
 
-@dataclass
+@dataclass(slots=True)
 class StudentAssignment:
     """Represents an assignment given to students"""
     assignment_id: str
@@ -48,46 +230,117 @@ class StudentAssignment:
     description: str
     due_date: datetime
     question_paper_id: str
-    assigned_students: List[str]
+    assigned_students: Tuple[str, ...]  # Snapshot of the class roster at creation
     status: str  # 'active', 'completed', 'expired'
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'StudentAssignment':
+        """Build from a deserialized JSON record"""
+        return cls(**_record_kwargs(cls, data))
 
 class TeacherMode:
     def __init__(self, db_file: str = "teacher_mode.json"):
         self.db_file = db_file
-        self.classes = {}
-        self.question_papers = {}
-        self.assignments = {}
+        self.classes: Dict[str, Class] = {}
+        self.question_papers: Dict[str, QuestionPaper] = {}
+        self.assignments: Dict[str, StudentAssignment] = {}
+        # Secondary indexes (ids in insertion order) so lookups don't scan every record
+        self._by_teacher = defaultdict(list)  # teacher_id -> class ids
+        self._by_student = defaultdict(list)  # student_id -> assignment ids
+        self._assignments_by_class = defaultdict(list)  # class_id -> assignment ids
+        # Set mirrors of each class's students/materials lists for O(1) membership checks
+        self._students_set = defaultdict(set)  # class_id -> student ids
+        self._materials_set = defaultdict(set)  # class_id -> PDF filenames
+        self._lock = threading.RLock()
+        self._dirty = set()  # (kind, id) pairs changed since the last flush
+        self._flush_timer = None
+        self._save_disabled = False  # Set when an unreadable data file could not be moved aside
         self._load_data()
+        atexit.register(self._flush)
     
     def _load_data(self):
         """Load teacher mode data from file"""
-        if os.path.exists(self.db_file):
+        if os.path.exists(self.db_file) and os.path.getsize(self.db_file) > 0:
             try:
-                with open(self.db_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.classes = data.get('classes', {})
-                    self.question_papers = data.get('question_papers', {})
-                    self.assignments = data.get('assignments', {})
+                # Parse straight from a read-only mapping instead of reading the file into memory first
+                with open(self.db_file, 'rb') as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                        memoryview(mm) as view:
+                    data = _json_loads(view)
+                    self.classes = {
+                        class_id: Class.from_dict(class_data)
+                        for class_id, class_data in data.get('classes', {}).items()
+                    }
+                    self.question_papers = {
+                        paper_id: QuestionPaper.from_dict(paper_data)
+                        for paper_id, paper_data in data.get('question_papers', {}).items()
+                    }
+                    self.assignments = {
+                        assignment_id: StudentAssignment.from_dict(assignment_data)
+                        for assignment_id, assignment_data in data.get('assignments', {}).items()
+                    }
                     
-                    # Convert timestamps back to datetime objects
-                    for class_data in self.classes.values():
-                        if 'created_date' in class_data:
-                            class_data['created_date'] = datetime.fromisoformat(class_data['created_date'])
-                        if 'last_activity' in class_data:
-                            class_data['last_activity'] = datetime.fromisoformat(class_data['last_activity'])
-                    
-                    for paper_data in self.question_papers.values():
-                        if 'created_date' in paper_data:
-                            paper_data['created_date'] = datetime.fromisoformat(paper_data['created_date'])
-                    
-                    for assignment_data in self.assignments.values():
-                        if 'due_date' in assignment_data:
-                            assignment_data['due_date'] = datetime.fromisoformat(assignment_data['due_date'])
+                    self._build_indexes()
             except Exception as e:
                 print(f"Error loading teacher mode data: {e}")
+                self.classes, self.question_papers, self.assignments = {}, {}, {}
+                self._build_indexes()
+                # Move the unreadable file aside so the next save does not overwrite it
+                corrupt_file = f"{self.db_file}.corrupt-{datetime.now():%Y%m%d%H%M%S}"
+                try:
+                    os.replace(self.db_file, corrupt_file)
+                    print(f"⚠️ Kept unreadable teacher mode data as {corrupt_file}")
+                except OSError as move_error:
+                    print(f"⚠️ Could not move unreadable teacher mode data aside, saving is disabled: {move_error}")
+                    self._save_disabled = True
+    
+    def _build_indexes(self):
+        """Rebuild the teacher/student/class lookup indexes from the loaded data"""
+        self._by_teacher.clear()
+        self._by_student.clear()
+        self._assignments_by_class.clear()
+        self._students_set.clear()
+        self._materials_set.clear()
+        for class_id, class_obj in self.classes.items():
+            self._by_teacher[class_obj.teacher_id].append(class_id)
+            self._students_set[class_id] = set(class_obj.students)
+            self._materials_set[class_id] = set(class_obj.materials)
+        for assignment_id, assignment in self.assignments.items():
+            self._index_assignment(assignment_id, assignment)
+    
+    def _index_assignment(self, assignment_id: str, assignment: StudentAssignment):
+        """Add an assignment to the class and student indexes"""
+        self._assignments_by_class[assignment.class_id].append(assignment_id)
+        for student_id in assignment.assigned_students:
+            self._by_student[student_id].append(assignment_id)
+    
+    def _mark_dirty(self, kind: str, item_id: str):
+        """Record a change and schedule a coalesced write to disk"""
+        with self._lock:
+            self._dirty.add((kind, item_id))
+            if len(self._dirty) >= FLUSH_MAX_PENDING:
+                self._flush()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(FLUSH_INTERVAL_SECONDS, self._flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+    
+    def _flush(self):
+        """Write pending changes to disk, if any"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return
+            self._save_data()
+            self._dirty.clear()
     
     def _save_data(self):
         """Save teacher mode data to file"""
+        if self._save_disabled:
+            print("⚠️ Not saving teacher mode data: the existing file could not be loaded")
+            return
         try:
             data_to_save = {
                 'classes': self.classes,
@@ -95,44 +348,122 @@ class TeacherMode:
                 'assignments': self.assignments
             }
             
-            # Convert datetime objects to strings for JSON serialization
-            for class_data in data_to_save['classes'].values():
-                if 'created_date' in class_data:
-                    class_data['created_date'] = class_data['created_date'].isoformat()
-                if 'last_activity' in class_data:
-                    class_data['last_activity'] = class_data['last_activity'].isoformat()
-            
-            for paper_data in data_to_save['question_papers'].values():
-                if 'created_date' in paper_data:
-                    paper_data['created_date'] = paper_data['created_date'].isoformat()
-            
-            for assignment_data in data_to_save['assignments'].values():
-                if 'due_date' in assignment_data:
-                    assignment_data['due_date'] = assignment_data['due_date'].isoformat()
-            
-            with open(self.db_file, 'w', encoding='utf-8') as f:
-                json.dump(data_to_save, f, indent=2, ensure_ascii=False)
+            # Write to a per-process temp file, fsync, then swap it in so a crash never leaves a truncated store
+            tmp_file = f"{self.db_file}.tmp.{os.getpid()}"
+            with open(tmp_file, 'wb') as f:
+                f.write(_json_dumps(data_to_save))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.db_file)
         except Exception as e:
             print(f"Error saving teacher mode data: {e}")
     
+    def _extract_with_cache(self, filepath: str) -> Optional[str]:
+        """Extract text from a PDF, reusing the cached text for identical file contents"""
+        try:
+            file_hash = _file_sha256(filepath)
+        except OSError as e:
+            # Missing or unreadable material: skip it rather than fail the whole paper
+            print(f"Skipping material {filepath}: {e}")
+            return None
+        
+        try:
+            cache_path = os.path.join(PDF_TEXT_CACHE_DIR, file_hash + ".txt")
+            if os.path.exists(cache_path):
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    return f.read()
+        except OSError as e:
+            print(f"Error reading PDF text cache: {e}")
+            cache_path = None
+        
+        result = _get_pdf_service().extract_text_from_pdf(filepath)
+        if not result.get('success'):
+            return None
+        
+        if cache_path:
+            try:
+                os.makedirs(PDF_TEXT_CACHE_DIR, exist_ok=True)
+                tmp_path = f"{cache_path}.{uuid.uuid4().hex[:8]}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(result['text'])
+                os.replace(tmp_path, cache_path)
+            except OSError as e:
+                print(f"Error writing PDF text cache: {e}")
+        
+        return result['text']
+    
+    def _generate_questions_cached(self, llm_service: 'LLMService', content: str, count: int, difficulty: str) -> List[Dict]:
+        """Generate MCQs, reusing earlier LLM output for identical content and settings"""
+        key = hashlib.sha256(f"{content}|{difficulty}|{count}|mcq|{PROMPT_VERSION}".encode('utf-8')).hexdigest()
+        cache_path = os.path.join(LLM_QUESTION_CACHE_DIR, key + ".json")
+        
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    return _json_loads(f.read())
+            except (OSError, ValueError) as e:
+                print(f"Error reading question cache: {e}")
+        
+        questions, from_model = llm_service.generate_questions_with_source(content, count, "mcq", difficulty)
+        
+        # Only cache real model output, never the placeholder questions from a fallback
+        if questions and from_model:
+            try:
+                os.makedirs(LLM_QUESTION_CACHE_DIR, exist_ok=True)
+                tmp_path = f"{cache_path}.{uuid.uuid4().hex[:8]}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(_json_dumps(questions))
+                os.replace(tmp_path, cache_path)
+            except (OSError, TypeError) as e:
+                print(f"Error writing question cache: {e}")
+        
+        return questions
+    
+    def _generate_questions_by_difficulty(self, llm_service: 'LLMService', content: str,
+                                          difficulty_distribution: Dict[str, int]) -> List[Dict]:
+        """Generate MCQs for every difficulty level concurrently, returned in shuffled order"""
+        requested = {difficulty: count for difficulty, count in difficulty_distribution.items() if count > 0}
+        questions = []
+        if not requested:
+            return questions
+        
+        with ThreadPoolExecutor(max_workers=len(requested)) as executor:
+            futures = {
+                executor.submit(self._generate_questions_cached, llm_service, content, count, difficulty): difficulty
+                for difficulty, count in requested.items()
+            }
+            for future in as_completed(futures):
+                try:
+                    questions.extend(future.result())
+                except Exception as e:
+                    print(f"Error generating {futures[future]} questions: {e}")
+                    # Continue with other difficulties
+        
+        # Mix difficulty levels in the final paper
+        random.shuffle(questions)
+        return questions
+    
     def create_class(self, teacher_id: str, name: str, subject: str, grade: str) -> Dict:
         """Create a new class"""
         class_id = f"class_{uuid.uuid4().hex[:8]}"
         
-        new_class = {
-            'class_id': class_id,
-            'teacher_id': teacher_id,
-            'name': name,
-            'subject': subject,
-            'grade': grade,
-            'students': [],
-            'materials': [],
-            'created_date': datetime.now(),
-            'last_activity': datetime.now()
-        }
-        
-        self.classes[class_id] = new_class
-        self._save_data()
+        now = datetime.now()
+        new_class = Class(
+            class_id=class_id,
+            teacher_id=teacher_id,
+            name=name,
+            subject=subject,
+            grade=grade,
+            students=[],
+            materials=[],
+            created_date=now,
+            last_activity=now
+        )
+        
+        with self._lock:
+            self.classes[class_id] = new_class
+            self._by_teacher[teacher_id].append(class_id)
+            self._mark_dirty('classes', class_id)
         
         return {
             'success': True,
@@ -142,43 +473,51 @@ class TeacherMode:
     
     def add_student_to_class(self, class_id: str, student_id: str) -> Dict:
         """Add a student to a class"""
-        if class_id not in self.classes:
-            return {'success': False, 'error': 'Class not found'}
-        
-        if student_id not in self.classes[class_id]['students']:
-            self.classes[class_id]['students'].append(student_id)
-            self.classes[class_id]['last_activity'] = datetime.now()
-            self._save_data()
+        # Existence and membership are checked under the lock so concurrent requests cannot both add
+        with self._lock:
+            if class_id not in self.classes:
+                return {'success': False, 'error': 'Class not found'}
             
-            return {
-                'success': True,
-                'message': f'Student added to class successfully'
-            }
-        else:
-            return {
-                'success': False,
-                'error': 'Student already in class'
-            }
+            students = self._students_set[class_id]
+            if student_id in students:
+                return {
+                    'success': False,
+                    'error': 'Student already in class'
+                }
+            
+            students.add(student_id)
+            self.classes[class_id].students.append(student_id)
+            self.classes[class_id].last_activity = datetime.now()
+            self._mark_dirty('classes', class_id)
+        
+        return {
+            'success': True,
+            'message': f'Student added to class successfully'
+        }
     
     def upload_material(self, class_id: str, pdf_filename: str) -> Dict:
         """Upload material to a class"""
-        if class_id not in self.classes:
-            return {'success': False, 'error': 'Class not found'}
-        
-        if pdf_filename not in self.classes[class_id]['materials']:
-            self.classes[class_id]['materials'].append(pdf_filename)
-            self.classes[class_id]['last_activity'] = datetime.now()
-            self._save_data()
+        # Checked under the lock, as in add_student_to_class
+        with self._lock:
+            if class_id not in self.classes:
+                return {'success': False, 'error': 'Class not found'}
             
-            return {
-                'success': True,
-                'message': f'Material "{pdf_filename}" uploaded successfully'
-            }
-        else:
-            return {
-                'success': False,
-                'error': 'Material already uploaded'
-            }
+            materials = self._materials_set[class_id]
+            if pdf_filename in materials:
+                return {
+                    'success': False,
+                    'error': 'Material already uploaded'
+                }
+            
+            materials.add(pdf_filename)
+            self.classes[class_id].materials.append(pdf_filename)
+            self.classes[class_id].last_activity = datetime.now()
+            self._mark_dirty('classes', class_id)
+        
+        return {
+            'success': True,
+            'message': f'Material "{pdf_filename}" uploaded successfully'
+        }
     
     def generate_question_paper(self, class_id: str, title: str, total_marks: int, 
                                duration_minutes: int, difficulty_distribution: Dict[str, int],
@@ -189,59 +528,46 @@ class TeacherMode:
         
         class_info = self.classes[class_id]
         
-        # Import services
-        from .llm_service import llm_service
-        from .pdf_service import pdf_service
-        
-        # Get content from all materials
-        all_content = ""
-        for material in class_info['materials']:
-            filepath = os.path.join('../uploads', material)
-            if os.path.exists(filepath):
-                result = pdf_service.extract_text_from_pdf(filepath)
-                if result.get('success'):
-                    all_content += result['text'] + "\n\n"
+        # Get content from all materials, one PDF at a time: PyMuPDF is not thread-safe,
+        # and the text cache already makes repeat extractions cheap
+        # Missing files are skipped by _extract_with_cache (it fails on the hash open), saving a stat per file
+        texts = [
+            self._extract_with_cache(os.path.join('../uploads', material))
+            for material in class_info.materials
+        ]
+        # Boilerplate repeated across chapters would otherwise be paid for in every question request
+        all_content = _join_unique_blocks(texts)
         
         if not all_content.strip():
             return {'success': False, 'error': 'No content available from uploaded materials'}
         
         # Generate questions based on difficulty distribution
-        questions = []
-        total_questions = sum(difficulty_distribution.values())
-        
-        for difficulty, count in difficulty_distribution.items():
-            if count > 0:
-                difficulty_questions = llm_service.generate_questions_from_text(
-                    all_content, count, "mcq", difficulty
-                )
-                questions.extend(difficulty_questions)
-        
-        # Shuffle questions
-        random.shuffle(questions)
+        questions = self._generate_questions_by_difficulty(_get_llm_service(), all_content, difficulty_distribution)
         
         # Create question paper
         paper_id = f"paper_{uuid.uuid4().hex[:8]}"
-        question_paper = {
-            'paper_id': paper_id,
-            'class_id': class_id,
-            'title': title,
-            'subject': class_info['subject'],
-            'total_marks': total_marks,
-            'duration_minutes': duration_minutes,
-            'questions': questions,
-            'difficulty_distribution': difficulty_distribution,
-            'created_date': datetime.now(),
-            'instructions': instructions or f"Answer all questions. Total marks: {total_marks}. Time: {duration_minutes} minutes."
-        }
-        
-        self.question_papers[paper_id] = question_paper
-        self._save_data()
+        question_paper = QuestionPaper(
+            paper_id=paper_id,
+            class_id=class_id,
+            title=title,
+            subject=class_info.subject,
+            total_marks=total_marks,
+            duration_minutes=duration_minutes,
+            questions=questions,
+            difficulty_distribution=difficulty_distribution,
+            created_date=datetime.now(),
+            instructions=instructions or f"Answer all questions. Total marks: {total_marks}. Time: {duration_minutes} minutes."
+        )
+        
+        with self._lock:
+            self.question_papers[paper_id] = question_paper
+            self._mark_dirty('question_papers', paper_id)
         
         return {
             'success': True,
             'paper_id': paper_id,
             'message': f'Question paper "{title}" generated successfully',
-            'question_paper': question_paper
+            'question_paper': asdict(question_paper)
         }
     
     def generate_question_paper_from_content(self, class_id: str, title: str, total_marks: int, 
@@ -254,62 +580,47 @@ class TeacherMode:
         
         class_info = self.classes[class_id]
         
-        # Import services
-        from .llm_service import llm_service
-        
         if not pdf_content.strip():
             return {'success': False, 'error': 'No content provided for question generation'}
         
         # Generate questions based on difficulty distribution
-        questions = []
-        total_questions = sum(difficulty_distribution.values())
-        
-        for difficulty, count in difficulty_distribution.items():
-            if count > 0:
-                try:
-                    difficulty_questions = llm_service.generate_questions_from_text(
-                        pdf_content, count, "mcq", difficulty
-                    )
-                    questions.extend(difficulty_questions)
-                except Exception as e:
-                    print(f"Error generating {difficulty} questions: {e}")
-                    # Continue with other difficulties
+        questions = self._generate_questions_by_difficulty(_get_llm_service(), pdf_content, difficulty_distribution)
         
         if not questions:
             return {'success': False, 'error': 'Failed to generate questions from the provided content'}
         
-        # Shuffle questions
-        random.shuffle(questions)
-        
         # Create question paper
         paper_id = f"paper_{uuid.uuid4().hex[:8]}"
-        question_paper = {
-            'paper_id': paper_id,
-            'class_id': class_id,
-            'title': title,
-            'subject': class_info['subject'],
-            'total_marks': total_marks,
-            'duration_minutes': duration_minutes,
-            'questions': questions,
-            'difficulty_distribution': difficulty_distribution,
-            'created_date': datetime.now(),
-            'instructions': instructions or f"Answer all questions. Total marks: {total_marks}. Time: {duration_minutes} minutes.",
-            'source_pdf': pdf_filename  # Track the source PDF
-        }
-        
-        self.question_papers[paper_id] = question_paper
-        self._save_data()
-        
-        # Add the uploaded PDF to class materials if it's not already there
-        if pdf_filename and pdf_filename not in class_info['materials']:
-            class_info['materials'].append(pdf_filename)
-            self._save_data()
+        question_paper = QuestionPaper(
+            paper_id=paper_id,
+            class_id=class_id,
+            title=title,
+            subject=class_info.subject,
+            total_marks=total_marks,
+            duration_minutes=duration_minutes,
+            questions=questions,
+            difficulty_distribution=difficulty_distribution,
+            created_date=datetime.now(),
+            instructions=instructions or f"Answer all questions. Total marks: {total_marks}. Time: {duration_minutes} minutes.",
+            source_pdf=pdf_filename  # Track the source PDF
+        )
+        
+        with self._lock:
+            self.question_papers[paper_id] = question_paper
+            self._mark_dirty('question_papers', paper_id)
+            
+            # Add the uploaded PDF to class materials if it's not already there
+            materials = self._materials_set[class_id]
+            if pdf_filename and pdf_filename not in materials:
+                materials.add(pdf_filename)
+                class_info.materials.append(pdf_filename)
+                self._mark_dirty('classes', class_id)
         
         return {
             'success': True,
             'paper_id': paper_id,
             'message': f'Question paper "{title}" generated successfully from uploaded material',
-            'question_paper': question_paper
+            'question_paper': asdict(question_paper)
         }
     
     def create_assignment(self, class_id: str, title: str, description: str, 
@@ -323,19 +634,21 @@ class TeacherMode:
         
         assignment_id = f"assignment_{uuid.uuid4().hex[:8]}"
         
-        assignment = {
-            'assignment_id': assignment_id,
-            'class_id': class_id,
-            'title': title,
-            'description': description,
-            'due_date': due_date,
-            'question_paper_id': question_paper_id,
-            'assigned_students': self.classes[class_id]['students'].copy(),
-            'status': 'active'
-        }
-        
-        self.assignments[assignment_id] = assignment
-        self._save_data()
+        assignment = StudentAssignment(
+            assignment_id=assignment_id,
+            class_id=class_id,
+            title=title,
+            description=description,
+            due_date=due_date,
+            question_paper_id=question_paper_id,
+            assigned_students=tuple(self.classes[class_id].students),
+            status='active'
+        )
+        
+        with self._lock:
+            self.assignments[assignment_id] = assignment
+            self._index_assignment(assignment_id, assignment)
+            self._mark_dirty('assignments', assignment_id)
         
         return {
             'success': True,
@@ -345,24 +658,18 @@ class TeacherMode:
     
     def get_teacher_classes(self, teacher_id: str) -> List[Dict]:
         """Get all classes for a teacher"""
-        teacher_classes = []
-        for class_data in self.classes.values():
-            if class_data['teacher_id'] == teacher_id:
-                teacher_classes.append(class_data)
-        return teacher_classes
+        return [asdict(self.classes[class_id]) for class_id in self._by_teacher.get(teacher_id, ())]
     
     def get_class_details(self, class_id: str) -> Optional[Dict]:
         """Get detailed information about a class"""
         if class_id in self.classes:
-            class_data = self.classes[class_id].copy()
+            class_data = asdict(self.classes[class_id])
             
             # Add assignment information
-            class_assignments = []
-            for assignment in self.assignments.values():
-                if assignment['class_id'] == class_id:
-                    class_assignments.append(assignment)
-            
-            class_data['assignments'] = class_assignments
+            class_data['assignments'] = [
+                asdict(self.assignments[assignment_id])
+                for assignment_id in self._assignments_by_class.get(class_id, ())
+            ]
             return class_data
         
         return None
@@ -380,86 +687,44 @@ class TeacherMode:
                 'success': True,
                 'format': 'html',
                 'content': html_content,
-                'filename': f"{paper['title'].replace(' ', '_')}.html"
+                'filename': f"{paper.title.replace(' ', '_')}.html"
             }
         elif format == "json":
             return {
                 'success': True,
                 'format': 'json',
-                'content': paper,
-                'filename': f"{paper['title'].replace(' ', '_')}.json"
+                'content': asdict(paper),
+                'filename': f"{paper.title.replace(' ', '_')}.json"
             }
         else:
             return {'success': False, 'error': 'Unsupported format'}
     
-    def _generate_html_paper(self, paper: Dict) -> str:
+    def _generate_html_paper(self, paper: QuestionPaper) -> str:
         """Generate HTML version of question paper"""
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>{paper['title']}</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 40px; }}
-                .header {{ text-align: center; border-bottom: 2px solid #333; padding-bottom: 20px; margin-bottom: 30px; }}
-                .instructions {{ background-color: #f5f5f5; padding: 15px; margin-bottom: 30px; border-radius: 5px; }}
-                .question {{ margin-bottom: 25px; }}
-                .question-number {{ font-weight: bold; color: #333; }}
-                .options {{ margin-left: 20px; }}
-                .option {{ margin: 5px 0; }}
-                .footer {{ margin-top: 50px; text-align: center; font-size: 12px; color: #666; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>{paper['title']}</h1>
-                <p><strong>Subject:</strong> {paper['subject']}</p>
-                <p><strong>Total Marks:</strong> {paper['total_marks']} | <strong>Duration:</strong> {paper['duration_minutes']} minutes</p>
-            </div>
-            
-            <div class="instructions">
-                <h3>Instructions:</h3>
-                <p>{paper['instructions']}</p>
-            </div>
-            
-            <div class="questions">
-        """
-        
-        for i, question in enumerate(paper['questions'], 1):
-            html += f"""
-                <div class="question">
-                    <div class="question-number">Q{i}. {question['question']}</div>
-                    <div class="options">
-            """
-            
-            for j, option in enumerate(question['options']):
-                html += f'<div class="option">{chr(65+j)}. {option}</div>'
-            
-            html += """
-                    </div>
-                </div>
-            """
-        
-        html += """
-            </div>
-            
-            <div class="footer">
-                <p>Generated by AI Tutor for Rural India</p>
-                <p>Date: """ + datetime.now().strftime("%B %d, %Y") + """</p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        return html
+        parts = []
+        for i, question in enumerate(paper.questions, 1):
+            header = _QUESTION_HEADERS[i - 1] if i <= len(_QUESTION_HEADERS) else _HTML_QUESTION_HEADER.format(number=i)
+            parts.extend((header, question['question'], _HTML_QUESTION_OPTIONS_OPEN))
+            # Options past Z (rare, malformed model output) are numbered instead of raising IndexError
+            parts.extend(
+                f'<div class="option">{_OPTION_LETTERS[j] if j < len(_OPTION_LETTERS) else j + 1}. {option}</div>'
+                for j, option in enumerate(question['options'])
+            )
+            parts.append(_HTML_QUESTION_CLOSE)
+        
+        return _HTML_TEMPLATE.format_map({
+            'title': paper.title,
+            'subject': paper.subject,
+            'total_marks': paper.total_marks,
+            'duration_minutes': paper.duration_minutes,
+            'instructions': paper.instructions,
+            'questions_html': "".join(parts),
+            'date': datetime.now().strftime("%B %d, %Y")
+        })
     
     def get_student_assignments(self, student_id: str) -> List[Dict]:
         """Get all assignments for a student"""
-        student_assignments = []
-        for assignment in self.assignments.values():
-            if student_id in assignment['assigned_students']:
-                student_assignments.append(assignment)
-        return student_assignments
+        return [asdict(self.assignments[assignment_id]) for assignment_id in self._by_student.get(student_id, ())]
 
 # Global instance
 teacher_mode = TeacherMode("../teacher_mode.json") 
\ No newline at end of file
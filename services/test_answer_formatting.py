@@ -3,9 +3,17 @@
 Test answer formatting to ensure no markdown symbols appear
 """
 
+import re
 import sys
 import os
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+_here = os.path.dirname(os.path.abspath(__file__))
+if _here not in sys.path:
+    sys.path.insert(0, _here)
+
+from llm_service import LLMService
+
+# Markdown symbols to flag, longest alternatives first so '**' is not also reported as '*'
+_MD_RE = re.compile(r'\*\*|\*|`|#+|- |\+ ')
 
 def test_answer_formatting():
     """Test that answers are generated without markdown symbols"""
@@ -13,8 +21,6 @@ def test_answer_formatting():
     print("=" * 40)
     
     try:
-        from .llm_service import LLMService
-        
         # Initialize LLM service
         llm_service = LLMService()
         print("✅ LLM service initialized")
@@ -38,12 +44,7 @@ def test_answer_formatting():
         print("-" * 50)
         
         # Check for markdown symbols
-        markdown_symbols = ['**', '*', '`', '#', '##', '###', '- ', '+ ']
-        found_symbols = []
-        
-        for symbol in markdown_symbols:
-            if symbol in answer:
-                found_symbols.append(symbol)
+        found_symbols = sorted({match.group(0) for match in _MD_RE.finditer(answer)})
         
         if found_symbols:
             print(f"\n❌ Found markdown symbols: {found_symbols}")
@@ -5,7 +5,16 @@ Test voice features without ffmpeg (using speech_recognition fallback)
 
 import sys
 import os
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+_here = os.path.dirname(os.path.abspath(__file__))
+if _here not in sys.path:
+    sys.path.insert(0, _here)
+
+from voice_service import VoiceService
+
+# Device-name fragments that mark a device as not a microphone
+OUTPUT_KEYWORDS = frozenset({'output', 'speaker', 'playback', 'headphones'})
+NOT_MIC_KEYWORDS = frozenset({'stereo mix', 'what u hear', 'loopback'})
+_NON_INPUT_KEYWORDS = OUTPUT_KEYWORDS | NOT_MIC_KEYWORDS
 
 def test_voice_without_ffmpeg():
     """Test voice service without ffmpeg"""
@@ -13,8 +22,6 @@ def test_voice_without_ffmpeg():
     print("=" * 40)
     
     try:
-        from .voice_service import VoiceService
-        
         # Initialize voice service
         print("1. Initializing voice service...")
         voice_service = VoiceService()
@@ -36,15 +43,11 @@ def test_voice_without_ffmpeg():
         import speech_recognition as sr
         mic_list = sr.Microphone.list_microphone_names()
         
-        # Filter out output devices
-        input_devices = []
-        for i, device in enumerate(mic_list):
-            device_lower = device.lower()
-            if any(output_keyword in device_lower for output_keyword in ['output', 'speaker', 'playback', 'headphones']):
-                continue
-            if any(not_mic_keyword in device_lower for not_mic_keyword in ['stereo mix', 'what u hear', 'loopback']):
-                continue
-            input_devices.append((i, device))
+        # Filter out output devices (substring match: names look like "Speakers (Realtek Audio)")
+        input_devices = [
+            (i, device) for i, device in enumerate(mic_list)
+            if not any(keyword in device.lower() for keyword in _NON_INPUT_KEYWORDS)
+        ]
         
         print(f"✅ Found {len(input_devices)} input devices")
         
@@ -1,9 +1,88 @@
 import os
 import re
+import functools
 import hashlib
-import json
+import mmap
+import secrets
+import socket
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple
-from datetime import datetime, timedelta
+import numpy as np
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    import json
+    ORJSON_AVAILABLE = False
+
+# Patterns compiled once at import rather than looked up in re's cache on every call
+_UNSAFE_CHARS = re.compile(r'[<>:"/\\|?*]')
+# HTML tags | whitespace runs | control characters, handled in one pass by sanitize_text
+_SANITIZE = re.compile(r'(<[^>]+>)|(\s+)|([\x00-\x08\x0B\x0C\x0E-\x1F\x7F])')
+_PERIOD = re.compile(r'\.')
+_WORD = re.compile(r'\S+')
+_EMAIL = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# Tags and the control characters \s doesn't already cover; text with neither only needs whitespace collapsed
+_MARKUP_OR_CTRL = re.compile(r'<[^>]+>|[\x00-\x08\x0E-\x1B\x7F]')
+
+# Large texts are checked with a Hyperscan (SIMD) database instead when the library is installed
+HYPERSCAN_MIN_TEXT_SIZE = 1 << 16  # characters
+try:
+    import hyperscan
+    
+    _MARKUP_OR_CTRL_DB = hyperscan.Database()
+    _MARKUP_OR_CTRL_DB.compile(
+        expressions=[rb'<[^>]+>', rb'[\x00-\x08\x0E-\x1B\x7F]'],
+        ids=[1, 2],
+        elements=2,
+        flags=[hyperscan.HS_FLAG_SINGLEMATCH] * 2
+    )
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
+
+# Read size for file hashing: large enough to keep syscalls and update() calls few
+HASH_BUFFER_SIZE = 1 << 21  # 2 MiB
+# Files at least this large are hashed with reads overlapped against hashing
+PIPELINED_HASH_MIN_SIZE = 32 << 20  # 32 MiB
+PIPELINED_HASH_BLOCK_SIZE = 8 << 20  # 8 MiB
+# Files up to this size are mapped and hashed in one call
+SINGLE_SHOT_HASH_MAX_SIZE = 8 << 20  # 8 MiB
+# validate_pdf_file results are cached per file version: (size, mtime, hash of the first 4KB)
+PDF_VALIDATION_PREFIX_SIZE = 4096
+PDF_VALIDATION_CACHE_SIZE = 256
+
+LANGUAGE_NAMES = {
+    'en': 'English',
+    'hi': 'Hindi',
+    'ta': 'Tamil',
+    'te': 'Telugu',
+    'bn': 'Bengali',
+    'mr': 'Marathi',
+    'gu': 'Gujarati',
+    'kn': 'Kannada',
+    'ml': 'Malayalam',
+    'pa': 'Punjabi'
+}
+SUPPORTED_LANGUAGES = frozenset(LANGUAGE_NAMES)
+
+_SIZE_UNITS = ("B", "KB", "MB", "GB")
+
+# Connectivity probe target and how long a probe result is reused
+CONNECTIVITY_PROBE_ADDR = ("1.1.1.1", 53)
+CONNECTIVITY_CACHE_SECONDS = 30
+_connectivity_cache = [float('-inf'), False]  # [monotonic time of last probe, result]
+
+def _seq_open(path: str, mode: str = 'rb', buffering: int = 1 << 20, **kwargs):
+    """Open a file for a front-to-back read, asking the kernel for aggressive readahead"""
+    f = open(path, mode, buffering=buffering, **kwargs)
+    if hasattr(os, 'posix_fadvise'):  # Linux/Unix only
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    return f
 
 def validate_pdf_file(file_path: str) -> Tuple[bool, str]:
     """
@@ -11,49 +90,70 @@ def validate_pdf_file(file_path: str) -> Tuple[bool, str]:
     Returns: (is_valid, message)
     """
     try:
-        # Check if file exists
-        if not os.path.exists(file_path):
-            return False, "File does not exist"
+        # Cheapest checks first so bad uploads never reach the PDF parser
+        # Check file extension
+        if not file_path.lower().endswith('.pdf'):
+            return False, "File is not a PDF"
         
-        # Check file size (max 50MB)
-        file_size = os.path.getsize(file_path)
-        if file_size > 50 * 1024 * 1024:
+        # Check that the file exists, is a regular file and its size (max 50MB) with a single stat
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            return False, "File does not exist"
+        if not stat.S_ISREG(st.st_mode):
+            return False, "Path is not a regular file"
+        if st.st_size > 50 * 1024 * 1024:
             return False, "File size exceeds 50MB limit"
+        if st.st_size == 0:
+            return False, "File is not a PDF"
         
-        # Check file extension
-        if not file_path.lower().endswith('.pdf'):
+        with open(file_path, 'rb') as f:
+            prefix = f.read(PDF_VALIDATION_PREFIX_SIZE)
+        
+        # Check the PDF header (readers accept it anywhere in the first 1KB)
+        if prefix.find(b'%PDF-', 0, 1024) == -1:
             return False, "File is not a PDF"
         
+        # Unchanged files (retries, re-indexing) skip the PyMuPDF parse entirely
+        prefix_hash = hashlib.blake2b(prefix, digest_size=16).digest()
+        return _validate_pdf_contents(file_path, st.st_size, st.st_mtime_ns, prefix_hash)
+    
+    except Exception as e:
+        return False, f"Error validating file: {str(e)}"
+
+@functools.lru_cache(maxsize=PDF_VALIDATION_CACHE_SIZE)
+def _validate_pdf_contents(file_path: str, size: int, mtime_ns: int, prefix_hash: bytes) -> Tuple[bool, str]:
+    """Parse the PDF and check it has text; size, mtime and prefix hash only key the cache"""
+    # Map the file read-only: PyMuPDF parses straight from the page cache without a copy,
+    # and only the parts it touches (xref, first pages) are actually read from disk
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
         # Try to open with PyMuPDF to check if it's a valid PDF
         import fitz
         try:
-            doc = fitz.open(file_path)
-            if doc.needs_pass:
-                doc.close()
-                return False, "PDF is password protected"
-            
-            # Check if PDF has content
-            text_content = ""
-            for page in doc:
-                text_content += page.get_text()
-            
-            doc.close()
-            
-            if len(text_content.strip()) < 100:
-                return False, "PDF contains insufficient text content"
-            
-            return True, "PDF is valid"
+            with memoryview(mm) as view:
+                doc = fitz.open(stream=view, filetype='pdf')
+                try:
+                    if doc.needs_pass:
+                        return False, "PDF is password protected"
+                    
+                    # Check if PDF has content, stopping as soon as we have enough
+                    total_chars = 0
+                    for page in doc:
+                        total_chars += len(page.get_text().strip())
+                        if total_chars >= 100:
+                            return True, "PDF is valid"
+                    
+                    return False, "PDF contains insufficient text content"
+                finally:
+                    doc.close()
             
         except Exception as e:
             return False, f"Invalid PDF file: {str(e)}"
-    
-    except Exception as e:
-        return False, f"Error validating file: {str(e)}"
 
 def clean_filename(filename: str) -> str:
     """Clean filename for safe storage"""
     # Remove or replace unsafe characters
-    filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
+    filename = _UNSAFE_CHARS.sub('_', filename)
     # Remove leading/trailing spaces and dots
     filename = filename.strip('. ')
     # Limit length
@@ -62,13 +162,52 @@ def clean_filename(filename: str) -> str:
         filename = name[:95] + ext
     return filename
 
-def generate_file_hash(file_path: str) -> str:
-    """Generate SHA-256 hash of file content"""
-    hash_sha256 = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_sha256.update(chunk)
-    return hash_sha256.hexdigest()
+def generate_file_hash(file_path: str, algo: str = "blake2b") -> str:
+    """
+    Generate a hash of file content for deduplication
+    algo: "blake2b" (256-bit, default; faster than SHA-256) or any hashlib algorithm name such as "sha256"
+    """
+    if algo == "blake2b":
+        hasher = hashlib.blake2b(digest_size=32)
+    else:
+        hasher = hashlib.new(algo)
+    
+    file_size = os.path.getsize(file_path)
+    if file_size >= PIPELINED_HASH_MIN_SIZE:
+        _hash_file_pipelined(file_path, hasher)
+        return hasher.hexdigest()
+    
+    # Small files are hashed in a single update() over a read-only map: no per-chunk round-trips
+    if 0 < file_size <= SINGLE_SHOT_HASH_MAX_SIZE:
+        with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            hasher.update(mm)
+        return hasher.hexdigest()
+    
+    # Reuse one buffer for every read instead of allocating a bytes object per chunk
+    buffer = memoryview(bytearray(HASH_BUFFER_SIZE))
+    with _seq_open(file_path, "rb", buffering=0) as f:
+        while n := f.readinto(buffer):
+            hasher.update(buffer[:n])
+    return hasher.hexdigest()
+
+def _hash_file_pipelined(file_path: str, hasher) -> None:
+    """Feed a file to hasher, reading the next block while a worker hashes the previous one"""
+    # hashlib releases the GIL while hashing large buffers, so disk reads and hashing overlap.
+    # Two buffers alternate: one is being filled while the other is being hashed.
+    buffers = (
+        memoryview(bytearray(PIPELINED_HASH_BLOCK_SIZE)),
+        memoryview(bytearray(PIPELINED_HASH_BLOCK_SIZE))
+    )
+    current = 0
+    pending = None
+    with ThreadPoolExecutor(max_workers=1) as executor, _seq_open(file_path, "rb", buffering=0) as f:
+        while n := f.readinto(buffers[current]):
+            if pending is not None:
+                pending.result()  # Blocks must reach the hasher in order
+            pending = executor.submit(hasher.update, buffers[current][:n])
+            current ^= 1
+        if pending is not None:
+            pending.result()
 
 def format_time_duration(seconds: int) -> str:
     """Format time duration in human readable format"""
@@ -88,87 +227,88 @@ def format_file_size(size_bytes: int) -> str:
     if size_bytes == 0:
         return "0B"
     
-    size_names = ["B", "KB", "MB", "GB"]
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024.0
-        i += 1
-    
-    return f"{size_bytes:.1f}{size_names[i]}"
+    # Unit index straight from the bit length: each unit is 2**10 times the previous one.
+    # int() takes floats too; sizes under one byte stay in bytes
+    i = min(max(int(abs(size_bytes)).bit_length() - 1, 0) // 10, len(_SIZE_UNITS) - 1)
+    return f"{size_bytes / (1 << (10 * i)):.1f}{_SIZE_UNITS[i]}"
 
 def extract_text_chunks(text: str, chunk_size: int = 2000, overlap: int = 200) -> List[str]:
     """Split text into overlapping chunks"""
     if len(text) <= chunk_size:
         return [text]
     
+    # Offsets of every '.', found in one scan; each chunk then binary-searches its boundary
+    periods = np.fromiter((m.start() for m in _PERIOD.finditer(text)), dtype=np.int64)
+    
+    text_len = len(text)
+    min_break = chunk_size // 2
     chunks = []
     start = 0
     
-    while start < len(text):
+    while start < text_len:
         end = start + chunk_size
         
-        # Try to break at sentence boundary
-        if end < len(text):
-            sentence_end = text.rfind('.', start, end)
-            if sentence_end > start + chunk_size // 2:
-                end = sentence_end + 1
+        # Try to break at sentence boundary (last '.' before end)
+        if end < text_len:
+            idx = np.searchsorted(periods, end) - 1
+            if idx >= 0 and periods[idx] > start + min_break:
+                end = int(periods[idx]) + 1
         
+        # str.strip() returns the slice itself when there is nothing to strip, so this is one copy
         chunk = text[start:end].strip()
         if chunk:
             chunks.append(chunk)
         
         start = end - overlap
-        if start >= len(text):
+        if start >= text_len:
             break
     
     return chunks
 
 def sanitize_text(text: str) -> str:
     """Sanitize text for safe processing"""
-    # Remove excessive whitespace
-    text = re.sub(r'\s+', ' ', text)
+    if not _has_markup_or_ctrl(text):
+        # Only whitespace to collapse, which split/join does entirely in C
+        return ' '.join(text.split())
     
-    # Remove control characters
-    text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', text)
-    
-    # Remove HTML tags
-    text = re.sub(r'<[^>]+>', '', text)
+    # Collapse whitespace to one space; drop HTML tags and control characters
+    text = _SANITIZE.sub(lambda m: ' ' if m.lastindex == 2 else '', text)
     
     return text.strip()
 
+def _has_markup_or_ctrl(text: str) -> bool:
+    """Check whether text contains HTML tags or non-whitespace control characters"""
+    if HYPERSCAN_AVAILABLE and len(text) >= HYPERSCAN_MIN_TEXT_SIZE:
+        # Byte-level scan: tags and ASCII control characters look the same in UTF-8.
+        # The handler stops the scan at the first hit, which Hyperscan reports as ScanTerminated.
+        try:
+            _MARKUP_OR_CTRL_DB.scan(
+                text.encode('utf-8', 'surrogatepass'),
+                match_event_handler=lambda *args: True
+            )
+        except hyperscan.ScanTerminated:
+            return True
+        return False
+    
+    return _MARKUP_OR_CTRL.search(text) is not None
+
 def calculate_reading_time(text: str, words_per_minute: int = 200) -> int:
     """Calculate estimated reading time in minutes"""
-    word_count = len(text.split())
+    # Count words without materializing a list of them
+    word_count = sum(1 for _ in _WORD.finditer(text))
     return max(1, word_count // words_per_minute)
 
 def generate_unique_id(prefix: str = "id") -> str:
-    """Generate unique identifier"""
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    random_suffix = os.urandom(4).hex()
-    return f"{prefix}_{timestamp}_{random_suffix}"
+    """Generate unique identifier (prefix, hex nanosecond timestamp, random suffix)"""
+    return f"{prefix}_{time.time_ns():x}_{secrets.token_hex(4)}"
 
 def is_valid_language_code(lang_code: str) -> bool:
     """Check if language code is supported"""
-    supported_languages = {
-        'en', 'hi', 'ta', 'te', 'bn', 'mr', 'gu', 'kn', 'ml', 'pa'
-    }
-    return lang_code.lower() in supported_languages
+    return lang_code.lower() in SUPPORTED_LANGUAGES
 
 def get_language_name(lang_code: str) -> str:
     """Get language name from code"""
-    language_names = {
-        'en': 'English',
-        'hi': 'Hindi',
-        'ta': 'Tamil',
-        'te': 'Telugu',
-        'bn': 'Bengali',
-        'mr': 'Marathi',
-        'gu': 'Gujarati',
-        'kn': 'Kannada',
-        'ml': 'Malayalam',
-        'pa': 'Punjabi'
-    }
-    return language_names.get(lang_code.lower(), 'Unknown')
+    return LANGUAGE_NAMES.get(lang_code.lower(), 'Unknown')
 
 def create_directory_if_not_exists(directory_path: str) -> bool:
     """Create directory if it doesn't exist"""
@@ -182,15 +322,14 @@ def create_directory_if_not_exists(directory_path: str) -> bool:
 def cleanup_old_files(directory: str, days: int = 7) -> int:
     """Clean up old files in directory"""
     try:
-        cutoff_time = datetime.now() - timedelta(days=days)
+        cutoff_time = time.time() - days * 86400
         deleted_count = 0
         
-        for filename in os.listdir(directory):
-            file_path = os.path.join(directory, filename)
-            if os.path.isfile(file_path):
-                file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                if file_time < cutoff_time:
-                    os.remove(file_path)
+        # scandir entries carry the file type from the directory read, so only stat() costs a syscall
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < cutoff_time:
+                    os.remove(entry.path)
                     deleted_count += 1
         
         return deleted_count
@@ -199,21 +338,33 @@ def cleanup_old_files(directory: str, days: int = 7) -> int:
         return 0
 
 def save_json_data(data: Dict, file_path: str) -> bool:
-    """Save data to JSON file"""
+    """Save data to JSON file atomically: a crash never leaves a partially written file"""
+    tmp_file = f"{file_path}.tmp.{os.getpid()}"
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        with open(tmp_file, 'wb') as f:
+            if ORJSON_AVAILABLE:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+            else:
+                f.write(json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, file_path)
         return True
     except Exception as e:
         print(f"Error saving JSON data: {e}")
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
         return False
 
 def load_json_data(file_path: str) -> Optional[Dict]:
     """Load data from JSON file"""
     try:
         if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with _seq_open(file_path, 'rb') as f:
+                raw = f.read()
+                return orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
         return None
     except Exception as e:
         print(f"Error loading JSON data: {e}")
@@ -221,21 +372,27 @@ def load_json_data(file_path: str) -> Optional[Dict]:
 
 def validate_email(email: str) -> bool:
     """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return _EMAIL.match(email) is not None
 
 def generate_password_hash(password: str) -> str:
     """Generate password hash"""
     return hashlib.sha256(password.encode()).hexdigest()
 
 def check_internet_connection() -> bool:
-    """Check if internet connection is available"""
+    """Check if internet connection is available (result cached for a few seconds)"""
+    now = time.monotonic()
+    if now - _connectivity_cache[0] < CONNECTIVITY_CACHE_SECONDS:
+        return _connectivity_cache[1]
+    
+    # A bare TCP connect to a public DNS resolver: no DNS lookup, TLS handshake or HTTP round trip
     try:
-        import requests
-        response = requests.get("https://www.google.com", timeout=3)
-        return response.status_code == 200
-    except:
-        return False
+        socket.create_connection(CONNECTIVITY_PROBE_ADDR, timeout=1).close()
+        is_online = True
+    except OSError:
+        is_online = False
+    
+    _connectivity_cache[:] = [now, is_online]
+    return is_online
 
 def get_system_info() -> Dict[str, str]:
     """Get system information"""
@@ -1,71 +1,293 @@
 import os
+import io
+import mmap
 import uuid
+import wave
+import re
+import hashlib
+import functools
+import shutil
+import stat
+import subprocess
 import tempfile
-from typing import Optional, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Tuple
 from gtts import gTTS
 import pyttsx3
 import speech_recognition as sr
-import whisper
+import queue
 import threading
 import time
+import numpy as np
+
+try:
+    # Offline STT fallback; online recognition works without it
+    from faster_whisper import WhisperModel
+    WHISPER_AVAILABLE = True
+except ImportError:
+    WHISPER_AVAILABLE = False
+
+try:
+    # Decode WAV recordings in-process instead of through Whisper's own audio decoding
+    import soundfile as sf
+    from scipy.signal import resample_poly
+    SOUNDFILE_AVAILABLE = True
+except ImportError:
+    SOUNDFILE_AVAILABLE = False
+
+# Synthesized gTTS audio is kept here (inside the audio folder), named by a hash of language and text
+TTS_CACHE_SUBDIR = "_cache"
+# Text longer than this is split at sentence boundaries and synthesized concurrently
+TTS_CHUNK_CHARS = 200
+# Upper bound on concurrent gTTS requests across all callers
+TTS_MAX_CONCURRENCY = 3
+# Consecutive gTTS failures that pause online TTS, and for how long
+GTTS_FAILURE_THRESHOLD = 3
+GTTS_COOLDOWN_SECONDS = 30
+# How long to wait for the pyttsx3 worker to start, and for one offline synthesis job
+OFFLINE_TTS_INIT_TIMEOUT_SECONDS = 10
+OFFLINE_TTS_TIMEOUT_SECONDS = 30
+# How long an offline STT request waits for the start-up Whisper load to finish
+WHISPER_READY_TIMEOUT_SECONDS = 15
+# Intermediate WAVs from pyttsx3 go to tmpfs when present, so short clips never touch the disk
+TTS_TEMP_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+# Ambient-noise calibration of a microphone is reused for this long
+CALIBRATION_TTL_SECONDS = 60
+# Whisper models expect 16 kHz mono input
+WHISPER_SAMPLE_RATE = 16000
+
+# Language tables built once at import instead of on every call
+SUPPORTED_LANGUAGES = {
+    'en': 'English',
+    'hi': 'Hindi',
+    'ta': 'Tamil',
+    'te': 'Telugu',
+    'bn': 'Bengali',
+    'mr': 'Marathi',
+    'gu': 'Gujarati',
+    'kn': 'Kannada',
+    'ml': 'Malayalam',
+    'pa': 'Punjabi'
+}
+# gTTS and Whisper take the plain language codes; Google Speech Recognition wants a region
+GTTS_LANGUAGES = {code: code for code in SUPPORTED_LANGUAGES}
+WHISPER_LANGUAGES = GTTS_LANGUAGES
+SR_LANGUAGES = {
+    'en': 'en-US',
+    'hi': 'hi-IN',
+    'ta': 'ta-IN',
+    'te': 'te-IN',
+    'bn': 'bn-IN',
+    'mr': 'mr-IN',
+    'gu': 'gu-IN',
+    'kn': 'kn-IN',
+    'ml': 'ml-IN',
+    'pa': 'pa-IN'
+}
+
+# Sentence ends, including the Devanagari danda used in Hindi/Marathi text
+_SENTENCE_END = re.compile(r'(?<=[.!?\u0964\u0965])\s+')
+
+def _chunk_sentences(text: str) -> List[str]:
+    """Split text at sentence boundaries into chunks of roughly TTS_CHUNK_CHARS characters"""
+    chunks = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text.strip()):
+        if current and len(current) + len(sentence) + 1 > TTS_CHUNK_CHARS:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+@functools.lru_cache(maxsize=1024)
+def _tts_cache_path(cache_dir: str, tts_lang: str, text: str) -> str:
+    """Path of the cached audio for this language and text"""
+    key = hashlib.sha256(f"{tts_lang}|{text}".encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f"{key}.mp3")
+
+def _file_size(path: str) -> int:
+    """Size of a file from a single stat, 0 if it does not exist"""
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return 0
+
+def _link_or_copy(src: str, dst: str) -> None:
+    """Hard-link src to dst, copying where links are not supported"""
+    try:
+        os.link(src, dst)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(src, dst)
+
+# Heavy offline components are shared by every VoiceService in the process
+_whisper_model = None
+_whisper_lock = threading.Lock()
+_whisper_load_started = False
+_whisper_ready = threading.Event()  # Set when the background load has finished, whether or not it succeeded
+_tts_engine = None
+_tts_queue = None
+_tts_lock = threading.Lock()
+
+def _start_tts_worker() -> Tuple[object, queue.Queue]:
+    """Start the process-wide pyttsx3 worker once; returns (engine or None, job queue)"""
+    global _tts_queue
+    with _tts_lock:
+        if _tts_queue is None:
+            _tts_queue = queue.Queue()
+            engine_ready = threading.Event()
+            threading.Thread(target=_tts_worker, args=(_tts_queue, engine_ready), daemon=True).start()
+            engine_ready.wait(OFFLINE_TTS_INIT_TIMEOUT_SECONDS)
+    return _tts_engine, _tts_queue
+
+def _tts_worker(jobs: queue.Queue, engine_ready: threading.Event):
+    """Own the pyttsx3 engine and synthesize queued (text, path, language, done, errors) jobs"""
+    global _tts_engine
+    try:
+        # Initialize pyttsx3 for offline TTS
+        engine = pyttsx3.init()
+        engine.setProperty('rate', 150)  # Speed of speech
+        engine.setProperty('volume', 0.9)  # Volume level
+        voices = engine.getProperty('voices') or []
+        _tts_engine = engine
+        print("✅ Offline TTS (pyttsx3) initialized successfully")
+    except Exception as e:
+        print(f"⚠️ Warning: Could not initialize offline TTS: {e}")
+        return
+    finally:
+        engine_ready.set()
+    
+    # Voices are enumerated once per engine and the match per language is remembered
+    voice_by_lang = {}
+    while True:
+        text, path, language, done, errors = jobs.get()
+        try:
+            if language not in voice_by_lang:
+                voice_by_lang[language] = next(
+                    (voice for voice in voices if language in voice.id.lower()), None
+                )
+            _select_voice(engine, voice_by_lang[language], voices)
+            engine.save_to_file(text, path)
+            engine.runAndWait()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+def _start_whisper_preload():
+    """Load Whisper once per process on a daemon thread, while the network is still there to fetch the weights"""
+    global _whisper_load_started
+    with _whisper_lock:
+        if _whisper_load_started:
+            return
+        _whisper_load_started = True
+    if not WHISPER_AVAILABLE:
+        _whisper_ready.set()
+        return
+    threading.Thread(target=_load_whisper_model, daemon=True).start()
+
+def _load_whisper_model():
+    """Load the shared faster-whisper model for offline STT"""
+    global _whisper_model
+    try:
+        # CTranslate2 int8 kernels: several times faster than FP32 PyTorch on CPU, at a fraction of the memory
+        _whisper_model = WhisperModel(
+            "base",
+            device="cpu",
+            compute_type="int8",
+            cpu_threads=os.cpu_count() or 0
+        )
+        print("✅ Offline STT (faster-whisper) loaded successfully")
+    except Exception as e:
+        print(f"⚠️ Warning: Could not load Whisper model: {e}")
+    finally:
+        _whisper_ready.set()
+
+def _whisper_status() -> str:
+    """State of the offline STT model: 'not_installed', 'loading', 'ready' or 'failed'"""
+    if not WHISPER_AVAILABLE:
+        return 'not_installed'
+    if not _whisper_ready.is_set():
+        return 'loading'
+    return 'ready' if _whisper_model is not None else 'failed'
+
+def _select_voice(engine, voice, voices: list):
+    """Set the engine voice for a language (basic mapping)"""
+    if voice:
+        engine.setProperty('voice', voice.id)
+        print(f"✅ Using voice: {voice.name}")
+    elif voices:
+        # Use default voice
+        engine.setProperty('voice', voices[0].id)
+        print(f"⚠️ Using default voice: {voices[0].name}")
 
 class VoiceService:
+    # Microphone name keywords (substring matches) used to rank input devices
+    _MIC_PREFERRED = frozenset(['headphone', 'headset', 'earphone', 'bluetooth', 'wireless', 'airpods'])
+    _MIC_FALLBACK = frozenset(['built-in', 'internal', 'default', 'system'])
+    # Output devices and loopback sources that are not real microphones
+    _MIC_EXCLUDE = frozenset(['output', 'speaker', 'playback', 'headphones', 'stereo mix', 'what u hear', 'loopback'])
+    # Looked up once at import: a PATH search instead of spawning `ffmpeg -version` per instance
+    _FFMPEG_PATH = shutil.which('ffmpeg')
+    
     def __init__(self, audio_folder: str = "audio"):
         self.audio_folder = audio_folder
         # Create audio folder if it doesn't exist
         os.makedirs(self.audio_folder, exist_ok=True)
+        self._tts_cache_dir = os.path.join(self.audio_folder, TTS_CACHE_SUBDIR)
+        os.makedirs(self._tts_cache_dir, exist_ok=True)
+        
+        self._tts_sem = threading.BoundedSemaphore(TTS_MAX_CONCURRENCY)
+        # Circuit breaker for gTTS: consecutive failures and the time until requests resume
+        self._gtts_fail_count = 0
+        self._gtts_open_until = 0.0
         
         self.recognizer = sr.Recognizer()
-        self.whisper_model = None
+        self._mic_candidates = None
+        self._calibration = {}  # device index -> (monotonic time, energy threshold)
         self.offline_tts_engine = None
         self._init_offline_components()
     
     def _init_offline_components(self):
         """Initialize offline TTS and STT components"""
-        try:
-            # Initialize pyttsx3 for offline TTS
-            self.offline_tts_engine = pyttsx3.init()
-            self.offline_tts_engine.setProperty('rate', 150)  # Speed of speech
-            self.offline_tts_engine.setProperty('volume', 0.9)  # Volume level
-            print("✅ Offline TTS (pyttsx3) initialized successfully")
-        except Exception as e:
-            print(f"⚠️ Warning: Could not initialize offline TTS: {e}")
-            self.offline_tts_engine = None
+        # pyttsx3 drivers are not re-entrant, so one worker thread owns the engine and
+        # request threads hand it jobs instead of calling runAndWait() themselves
+        self.offline_tts_engine, self._tts_queue = _start_tts_worker()
+        
+        # Warm Whisper up at start-up so the offline fallback is ready before the network drops
+        _start_whisper_preload()
         
         # Check FFmpeg availability
         self._check_ffmpeg()
     
     def _check_ffmpeg(self):
         """Check if FFmpeg is available for audio processing"""
-        try:
-            import subprocess
-            result = subprocess.run(['ffmpeg', '-version'], 
-                                  capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                print("✅ FFmpeg is available for audio processing")
-                self.ffmpeg_available = True
-            else:
-                print("⚠️ FFmpeg not available - some audio features may be limited")
-                self.ffmpeg_available = False
-        except (subprocess.TimeoutExpired, FileNotFoundError, Exception) as e:
-            print(f"⚠️ FFmpeg not found: {e}")
+        if VoiceService._FFMPEG_PATH is not None:
+            print(f"✅ FFmpeg is available for audio processing ({VoiceService._FFMPEG_PATH})")
+            self.ffmpeg_available = True
+        else:
+            print("⚠️ FFmpeg not found on PATH")
             print("💡 Install FFmpeg for better audio processing support")
             self.ffmpeg_available = False
     
     def text_to_speech(self, text: str, language: str = 'en', 
-                      use_offline: bool = False) -> Dict:
+                      use_offline: bool = False, return_bytes: bool = False) -> Dict:
         """
         Convert text to speech using online services (Google TTS)
-        Returns: dict with audio file path and metadata
+        Returns: dict with audio file path and metadata, or with 'audio_bytes' for
+        online audio when return_bytes is set (no per-request file is written)
         """
         try:
-            audio_id = str(uuid.uuid4())
-            audio_filename = f"{audio_id}.mp3"
+            audio_filename = f"{uuid.uuid4().hex}.mp3"
             audio_path = os.path.join(self.audio_folder, audio_filename)
             
             # Prioritize online TTS for better quality and language support
             try:
-                result = self._online_tts(text, audio_path, language)
+                result = self._online_tts(text, audio_path, language, return_bytes)
                 if result['success']:
                     return result
                 else:
@@ -95,35 +317,62 @@ class VoiceService:
                 'filename': None
             }
     
-    def _online_tts(self, text: str, audio_path: str, language: str) -> Dict:
+    def _online_tts(self, text: str, audio_path: str, language: str,
+                    return_bytes: bool = False) -> Dict:
         """Use gTTS for online text-to-speech"""
         try:
-            # Map language codes for gTTS
-            lang_map = {
-                'en': 'en',
-                'hi': 'hi',
-                'ta': 'ta',
-                'te': 'te',
-                'bn': 'bn',
-                'mr': 'mr',
-                'gu': 'gu',
-                'kn': 'kn',
-                'ml': 'ml',
-                'pa': 'pa'
-            }
+            tts_lang = GTTS_LANGUAGES.get(language, 'en')
+            cache_path = _tts_cache_path(self._tts_cache_dir, tts_lang, text)
             
-            tts_lang = lang_map.get(language, 'en')
-            print(f"🔊 Using Google TTS with language: {tts_lang}")
-            
-            # Create gTTS object with better configuration
-            tts = gTTS(text=text, lang=tts_lang, slow=False)
+            # Repeated prompts are served from the cache without a network round-trip
+            try:
+                if return_bytes:
+                    with open(cache_path, 'rb') as f:
+                        audio_bytes = f.read()
+                else:
+                    _link_or_copy(cache_path, audio_path)
+                print(f"♻️ Reusing cached TTS audio for language: {tts_lang}")
+            except FileNotFoundError:
+                print(f"🔊 Using Google TTS with language: {tts_lang}")
+                
+                # After repeated failures skip the network until the cooldown ends (offline TTS takes over)
+                if time.monotonic() < self._gtts_open_until:
+                    raise Exception("Google TTS paused after repeated failures")
+                
+                # Synthesize into memory; the only disk write is the cache entry
+                try:
+                    audio_bytes = self._synthesize_online(text, tts_lang)
+                except Exception:
+                    self._gtts_fail_count += 1
+                    if self._gtts_fail_count >= GTTS_FAILURE_THRESHOLD:
+                        self._gtts_open_until = time.monotonic() + GTTS_COOLDOWN_SECONDS
+                        print(f"⚠️ Google TTS failed {self._gtts_fail_count} times, pausing for {GTTS_COOLDOWN_SECONDS}s")
+                    raise
+                self._gtts_fail_count = 0
+                if not audio_bytes:
+                    raise Exception("Audio was not generated properly")
+                
+                # Save to the cache atomically so concurrent requests never link a partial file
+                tmp_path = f"{cache_path}.{uuid.uuid4().hex[:8]}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(audio_bytes)
+                os.replace(tmp_path, cache_path)
+                if not return_bytes:
+                    _link_or_copy(cache_path, audio_path)
             
-            # Save audio file
-            tts.save(audio_path)
+            if return_bytes:
+                return {
+                    'success': True,
+                    'audio_bytes': audio_bytes,
+                    'mimetype': 'audio/mpeg',
+                    'language': language,
+                    'method': 'google_tts_online'
+                }
             
             # Verify file was created and has content
-            if os.path.exists(audio_path) and os.path.getsize(audio_path) > 0:
-                print(f"✅ TTS audio saved: {audio_path} (size: {os.path.getsize(audio_path)} bytes)")
+            file_size = _file_size(audio_path)
+            if file_size > 0:
+                print(f"✅ TTS audio saved: {audio_path} (size: {file_size} bytes)")
                 
                 return {
                     'success': True,
@@ -144,6 +393,27 @@ class VoiceService:
                 'filename': None
             }
     
+    def _synthesize_online(self, text: str, tts_lang: str) -> bytes:
+        """Synthesize MP3 bytes with gTTS, requesting long text sentence by sentence in parallel"""
+        chunks = _chunk_sentences(text) if len(text) > TTS_CHUNK_CHARS else [text]
+        if len(chunks) == 1:
+            return self._gtts_bytes(text, tts_lang)
+        
+        print(f"🧩 Synthesizing {len(chunks)} sentence chunks concurrently")
+        # MP3 frames are self-contained, so the parts join in order into one playable stream
+        # (gTTS itself writes its internal text parts back to back the same way)
+        with ThreadPoolExecutor(max_workers=TTS_MAX_CONCURRENCY) as executor:
+            return b''.join(executor.map(lambda chunk: self._gtts_bytes(chunk, tts_lang), chunks))
+    
+    def _gtts_bytes(self, text: str, tts_lang: str) -> bytes:
+        """Run one gTTS request into memory"""
+        with self._tts_sem:
+            # Create gTTS object with better configuration
+            tts = gTTS(text=text, lang=tts_lang, slow=False)
+            buf = io.BytesIO()
+            tts.write_to_fp(buf)
+            return buf.getvalue()
+    
     def _offline_tts(self, text: str, audio_path: str, language: str) -> Dict:
         """Use pyttsx3 for offline text-to-speech"""
         try:
@@ -152,50 +422,33 @@ class VoiceService:
             
             print(f"🔊 Using offline TTS (pyttsx3) for language: {language}")
             
-            # Set voice based on language (basic mapping)
-            voices = self.offline_tts_engine.getProperty('voices')
-            if voices:
-                # Try to find appropriate voice for language
-                for voice in voices:
-                    if language in voice.id.lower():
-                        self.offline_tts_engine.setProperty('voice', voice.id)
-                        print(f"✅ Using voice: {voice.name}")
-                        break
-                else:
-                    # Use default voice
-                    self.offline_tts_engine.setProperty('voice', voices[0].id)
-                    print(f"⚠️ Using default voice: {voices[0].name}")
-            
-            # Save to temporary file first
-            temp_file = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
+            # Save to temporary file first, on RAM-backed tmpfs where available
+            temp_file = tempfile.NamedTemporaryFile(suffix='.wav', dir=TTS_TEMP_DIR, delete=False)
             temp_path = temp_file.name
             temp_file.close()
             
-            # Generate speech
-            self.offline_tts_engine.save_to_file(text, temp_path)
-            self.offline_tts_engine.runAndWait()
-            
-            # Verify temp file was created
-            if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
-                raise Exception("Failed to generate speech file")
-            
-            # Convert WAV to MP3 using pydub if available, otherwise copy
             try:
-                from pydub import AudioSegment
-                audio = AudioSegment.from_wav(temp_path)
-                audio.export(audio_path, format="mp3")
-                print(f"✅ Converted WAV to MP3: {audio_path}")
-            except ImportError:
-                # Fallback: just copy the WAV file and rename
-                import shutil
-                shutil.copy2(temp_path, audio_path)
-                print(f"⚠️ Using WAV format (pydub not available): {audio_path}")
-            
-            os.unlink(temp_path)  # Clean up temp file
+                # Generate speech on the engine's worker thread
+                done = threading.Event()
+                errors = []
+                self._tts_queue.put((text, temp_path, language, done, errors))
+                if not done.wait(OFFLINE_TTS_TIMEOUT_SECONDS):
+                    raise Exception("Offline TTS timed out")
+                if errors:
+                    raise errors[0]
+                
+                # Verify temp file was created
+                if _file_size(temp_path) == 0:
+                    raise Exception("Failed to generate speech file")
+                
+                self._wav_to_mp3(temp_path, audio_path)
+            finally:
+                os.unlink(temp_path)  # Clean up temp file, also on failure
             
             # Verify final file
-            if os.path.exists(audio_path) and os.path.getsize(audio_path) > 0:
-                print(f"✅ Offline TTS audio saved: {audio_path} (size: {os.path.getsize(audio_path)} bytes)")
+            file_size = _file_size(audio_path)
+            if file_size > 0:
+                print(f"✅ Offline TTS audio saved: {audio_path} (size: {file_size} bytes)")
                 
                 return {
                     'success': True,
@@ -216,10 +469,39 @@ class VoiceService:
                 'filename': None
             }
     
+    def _wav_to_mp3(self, src: str, dst: str):
+        """Convert WAV to MP3 with ffmpeg directly, then pydub, otherwise copy"""
+        if getattr(self, 'ffmpeg_available', False):
+            # A direct ffmpeg run streams the conversion instead of loading all PCM into Python
+            try:
+                result = subprocess.run(
+                    [VoiceService._FFMPEG_PATH, '-loglevel', 'error', '-nostdin', '-y', '-f', 'wav', '-i', src,
+                     '-codec:a', 'libmp3lame', '-qscale:a', '5', '-f', 'mp3', dst],
+                    capture_output=True, text=True
+                )
+                if result.returncode == 0:
+                    print(f"✅ Converted WAV to MP3: {dst}")
+                    return
+                print(f"⚠️ FFmpeg conversion failed: {result.stderr.strip()}")
+            except OSError as e:
+                print(f"⚠️ FFmpeg conversion failed: {e}")
+        
+        # Convert WAV to MP3 using pydub if available, otherwise copy
+        try:
+            from pydub import AudioSegment
+            audio = AudioSegment.from_wav(src)
+            audio.export(dst, format="mp3")
+            print(f"✅ Converted WAV to MP3: {dst}")
+        except ImportError:
+            # Fallback: just copy the WAV file and rename
+            shutil.copy2(src, dst)
+            print(f"⚠️ Using WAV format (pydub not available): {dst}")
+    
     def speech_to_text(self, audio_file_path: str, 
                       language: str = 'en') -> Dict:
         """
-        Convert speech to text using online services (Google Speech Recognition)
+        Convert speech to text using online services (Google Speech Recognition),
+        with offline Whisper when the online service cannot be reached
         """
         try:
             # Check if audio file exists
@@ -231,7 +513,11 @@ class VoiceService:
                 }
             
             # Use online Google Speech Recognition (no FFmpeg needed)
-            return self._online_speech_recognition(audio_file_path, language)
+            result = self._online_speech_recognition(audio_file_path, language)
+            if result.get('service_unavailable'):
+                print("🔄 Speech recognition service unavailable, using offline Whisper...")
+                return self._whisper_stt(audio_file_path, language)
+            return result
                 
         except Exception as e:
             return {
@@ -240,77 +526,58 @@ class VoiceService:
                 'text': None
             }
     
-    def _load_whisper_model(self) -> bool:
-        """Load Whisper model for offline STT"""
-        try:
-            if self.whisper_model is None:
-                self.whisper_model = whisper.load_model("base")
-            return True
-        except Exception as e:
-            print(f"Warning: Could not load Whisper model: {e}")
-            return False
-    
     def _whisper_stt(self, audio_file_path: str, language: str) -> Dict:
         """Use Whisper for speech-to-text"""
         try:
-            if not self.whisper_model:
-                raise Exception("Whisper model not loaded")
+            # The model is loaded in the background at start-up; give a load still in progress a moment
+            if not _whisper_ready.wait(WHISPER_READY_TIMEOUT_SECONDS):
+                raise Exception("Whisper model is still loading")
+            whisper_model = _whisper_model
+            if whisper_model is None:
+                raise Exception("Whisper model not available")
             
             # Validate audio file exists and is accessible
             if not audio_file_path:
                 raise Exception("Audio file path is empty")
             
-            if not os.path.exists(audio_file_path):
+            try:
+                st = os.stat(audio_file_path)
+            except FileNotFoundError:
                 raise Exception(f"Audio file does not exist: {audio_file_path}")
             
-            if not os.path.isfile(audio_file_path):
+            if not stat.S_ISREG(st.st_mode):
                 raise Exception(f"Audio file path is not a file: {audio_file_path}")
             
-            file_size = os.path.getsize(audio_file_path)
+            file_size = st.st_size
             if file_size == 0:
                 raise Exception(f"Audio file is empty: {audio_file_path}")
             
             print(f"🎤 Whisper STT: Processing file {audio_file_path} (size: {file_size} bytes)")
             
-            # Language mapping for Whisper
-            lang_map = {
-                'en': 'en',
-                'hi': 'hi',
-                'ta': 'ta',
-                'te': 'te',
-                'bn': 'bn',
-                'mr': 'mr',
-                'gu': 'gu',
-                'kn': 'kn',
-                'ml': 'ml',
-                'pa': 'pa'
-            }
-            
-            whisper_lang = lang_map.get(language, 'en')
+            whisper_lang = WHISPER_LANGUAGES.get(language, 'en')
             
-            # Try to transcribe audio with error handling for ffmpeg issues
+            # Decode first so an unreadable file is told apart from an inference failure by type
             try:
-                result = self.whisper_model.transcribe(
-                    audio_file_path,
-                    language=whisper_lang,
-                    task="transcribe"
-                )
-                
-                return {
-                    'success': True,
-                    'text': result['text'].strip(),
-                    'language': language,
-                    'method': 'whisper'
-                }
-                
-            except Exception as whisper_error:
-                # If Whisper fails due to ffmpeg, fall back to speech_recognition
-                if "ffmpeg" in str(whisper_error).lower() or "file" in str(whisper_error).lower():
-                    print(f"⚠️ Whisper failed due to ffmpeg/file issue: {whisper_error}")
-                    print("🔄 Falling back to speech_recognition...")
-                    return self._speech_recognition_stt(audio_file_path, language)
-                else:
-                    raise whisper_error
+                audio = self._load_audio_for_whisper(audio_file_path)
+            except (OSError, RuntimeError, ValueError) as decode_error:
+                raise Exception(f"Could not decode audio: {decode_error}")
+            
+            # The VAD filter drops silent stretches before decoding
+            segments, info = whisper_model.transcribe(
+                audio,
+                language=whisper_lang,
+                task="transcribe",
+                vad_filter=True
+            )
+            # Segments are decoded lazily as the generator is consumed
+            text = ' '.join(segment.text.strip() for segment in segments)
+            
+            return {
+                'success': True,
+                'text': text.strip(),
+                'language': language,
+                'method': 'whisper'
+            }
             
         except Exception as e:
             print(f"❌ Whisper STT error: {str(e)}")
@@ -320,47 +587,49 @@ class VoiceService:
                 'text': None
             }
     
+    def _load_audio_for_whisper(self, audio_file_path: str):
+        """Decode audio in-process to 16 kHz mono float32, or return the path for Whisper to decode"""
+        if not SOUNDFILE_AVAILABLE:
+            return audio_file_path
+        
+        audio, sample_rate = sf.read(audio_file_path, dtype='float32')
+        if audio.ndim > 1:
+            audio = audio.mean(axis=1)
+        if sample_rate != WHISPER_SAMPLE_RATE:
+            audio = resample_poly(audio, WHISPER_SAMPLE_RATE, sample_rate).astype(np.float32)
+        return audio
+    
     def _online_speech_recognition(self, audio_file_path: str, 
                                   language: str) -> Dict:
         """Use online Google Speech Recognition for STT (no FFmpeg needed)"""
         try:
-            # Language mapping for Google Speech Recognition
-            lang_map = {
-                'en': 'en-US',
-                'hi': 'hi-IN',
-                'ta': 'ta-IN',
-                'te': 'te-IN',
-                'bn': 'bn-IN',
-                'mr': 'mr-IN',
-                'gu': 'gu-IN',
-                'kn': 'kn-IN',
-                'ml': 'ml-IN',
-                'pa': 'pa-IN'
-            }
-            
-            sr_lang = lang_map.get(language, 'en-US')
+            sr_lang = SR_LANGUAGES.get(language, 'en-US')
             print(f"🎤 Using Google Speech Recognition with language: {sr_lang}")
             
-            with sr.AudioFile(audio_file_path) as source:
+            # Read the WAV through a read-only map: frames come straight from the page cache
+            # instead of being buffered by the file object first
+            with open(audio_file_path, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                    sr.AudioFile(mm) as source:
                 # Adjust for ambient noise
                 self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
                 audio = self.recognizer.record(source)
-                
-                # Use Google Speech Recognition (online, no FFmpeg needed)
-                text = self.recognizer.recognize_google(
-                    audio,
-                    language=sr_lang,
-                    show_all=False  # Get single best result
-                )
-                
-                print(f"✅ Speech recognized: {text}")
-                
-                return {
-                    'success': True,
-                    'text': text.strip(),
-                    'language': language,
-                    'method': 'google_speech_recognition_online'
-                }
+            
+            # Use Google Speech Recognition (online, no FFmpeg needed)
+            text = self.recognizer.recognize_google(
+                audio,
+                language=sr_lang,
+                show_all=False  # Get single best result
+            )
+            
+            print(f"✅ Speech recognized: {text}")
+            
+            return {
+                'success': True,
+                'text': text.strip(),
+                'language': language,
+                'method': 'google_speech_recognition_online'
+            }
                 
         except sr.UnknownValueError:
             print("❌ Could not understand audio")
@@ -374,7 +643,8 @@ class VoiceService:
             return {
                 'success': False,
                 'error': f'Speech recognition service error: {e}',
-                'text': None
+                'text': None,
+                'service_unavailable': True
             }
         except Exception as e:
             print(f"❌ Speech recognition error: {e}")
@@ -392,142 +662,72 @@ class VoiceService:
         try:
             # Check if microphone is available
             try:
-                # Try to get available microphones
-                mic_list = sr.Microphone.list_microphone_names()
-                print(f"Available microphones: {mic_list}")
+                # Microphones are enumerated and ranked once, on the first recording
+                mic_candidates = self._get_mic_candidates()
                 
-                if not mic_list:
-                    print("No microphones found, trying default microphone")
-                    mic = sr.Microphone()
-                else:
-                    # Try different microphone devices in order of preference
-                    mic = None
-                    preferred_keywords = ['headphone', 'headset', 'earphone', 'bluetooth', 'wireless', 'airpods']
-                    fallback_keywords = ['built-in', 'internal', 'default', 'system']
-                    
-                    # First, try to find preferred devices (headphones, etc.)
-                    # But filter out output devices that might be misidentified
-                    for i, mic_name in enumerate(mic_list):
-                        mic_lower = mic_name.lower()
-                        
-                        # Skip devices that are clearly output devices
-                        if any(output_keyword in mic_lower for output_keyword in ['output', 'speaker', 'playback', 'headphones']):
-                            continue
-                        # Skip devices that are clearly not microphones
-                        if any(not_mic_keyword in mic_lower for not_mic_keyword in ['stereo mix', 'what u hear', 'loopback']):
-                            continue
-                        
-                        if any(keyword in mic_lower for keyword in preferred_keywords):
-                            try:
-                                print(f"Trying preferred microphone {i}: {mic_name}")
-                                mic = sr.Microphone(device_index=i)
-                                # Test if this microphone works
-                                with mic as source:
-                                    self.recognizer.adjust_for_ambient_noise(source, duration=0.1)
-                                print(f"Successfully initialized preferred microphone: {mic_name}")
-                                break
-                            except Exception as e:
-                                print(f"Failed to initialize preferred microphone {i}: {e}")
-                                continue
-                    
-                    # If no preferred device found, try fallback devices (built-in, etc.)
-                    if mic is None:
-                        for i, mic_name in enumerate(mic_list):
-                            mic_lower = mic_name.lower()
-                            
-                            # Skip devices that are clearly output devices
-                            if any(output_keyword in mic_lower for output_keyword in ['output', 'speaker', 'playback', 'headphones']):
-                                continue
-                            # Skip devices that are clearly not microphones
-                            if any(not_mic_keyword in mic_lower for not_mic_keyword in ['stereo mix', 'what u hear', 'loopback']):
-                                continue
-                            
-                            if any(keyword in mic_lower for keyword in fallback_keywords):
-                                try:
-                                    print(f"Trying fallback microphone {i}: {mic_name}")
-                                    mic = sr.Microphone(device_index=i)
-                                    # Test if this microphone works
-                                    with mic as source:
-                                        self.recognizer.adjust_for_ambient_noise(source, duration=0.1)
-                                    print(f"Successfully initialized fallback microphone: {mic_name}")
-                                    break
-                                except Exception as e:
-                                    print(f"Failed to initialize fallback microphone {i}: {e}")
-                                    continue
-                    
-                    # If still no device found, try any available microphone
-                    if mic is None:
-                        for i, mic_name in enumerate(mic_list):
-                            mic_lower = mic_name.lower()
-                            
-                            # Skip devices that are clearly output devices
-                            if any(output_keyword in mic_lower for output_keyword in ['output', 'speaker', 'playback', 'headphones']):
-                                continue
-                            # Skip devices that are clearly not microphones
-                            if any(not_mic_keyword in mic_lower for not_mic_keyword in ['stereo mix', 'what u hear', 'loopback']):
-                                continue
-                            
-                            try:
-                                print(f"Trying any available microphone {i}: {mic_name}")
-                                mic = sr.Microphone(device_index=i)
-                                # Test if this microphone works
-                                with mic as source:
-                                    self.recognizer.adjust_for_ambient_noise(source, duration=0.1)
-                                print(f"Successfully initialized microphone: {mic_name}")
-                                break
-                            except Exception as e:
-                                print(f"Failed to initialize microphone {i}: {e}")
-                                continue
-                    
-                    # Final fallback to default microphone
-                    if mic is None:
-                        print("All specific microphones failed, using default microphone")
-                        try:
-                            mic = sr.Microphone()
-                            print("Using default microphone as fallback")
-                        except Exception as default_error:
-                            print(f"❌ Default microphone failed: {default_error}")
-                            return None
+                # Open the top-ranked device, moving down the list only if it fails to open
+                mic = None
+                for i, mic_name in mic_candidates:
+                    try:
+                        candidate = sr.Microphone(device_index=i)
+                        # A device calibrated moments ago is known to open; skip the probe
+                        if self._recent_calibration(i) is None:
+                            with candidate as source:
+                                self.recognizer.adjust_for_ambient_noise(source, duration=0.1)
+                        mic = candidate
+                        print(f"✅ Using microphone {i}: {mic_name}")
+                        break
+                    except OSError as e:
+                        print(f"Failed to open microphone {i}: {e}")
                 
-                # Ensure we have a working microphone
+                # Final fallback to default microphone
                 if mic is None:
-                    print("❌ No working microphone found")
-                    return None
-                
-                # Test microphone before using
-                try:
-                    with mic as source:
-                        self.recognizer.adjust_for_ambient_noise(source, duration=0.1)
-                    print("✅ Microphone test successful")
-                except Exception as test_error:
-                    print(f"❌ Microphone test failed: {test_error}")
-                    return None
+                    print("No specific microphone available, using default microphone")
+                    try:
+                        mic = sr.Microphone()
+                        with mic as source:
+                            self.recognizer.adjust_for_ambient_noise(source, duration=0.1)
+                        print("✅ Microphone test successful")
+                    except Exception as default_error:
+                        print(f"❌ Default microphone failed: {default_error}")
+                        return None
                 
                 try:
                     with mic as source:
                         print(f"Recording for {duration} seconds...")
-                        # Adjust for ambient noise
-                        self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
+                        # Adjust for ambient noise, reusing a recent calibration of this device
+                        energy_threshold = self._recent_calibration(mic.device_index)
+                        if energy_threshold is None:
+                            self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
+                            self._calibration[mic.device_index] = (time.monotonic(), self.recognizer.energy_threshold)
+                        else:
+                            self.recognizer.energy_threshold = energy_threshold
                         print("Listening... Speak now!")
                         
                         try:
                             audio = self.recognizer.listen(source, timeout=duration, phrase_time_limit=duration)
                             
                             # Save audio to file
-                            audio_id = str(uuid.uuid4())
-                            audio_filename = f"{audio_id}.wav"
+                            audio_filename = f"{uuid.uuid4().hex}.wav"
                             audio_path = os.path.join(self.audio_folder, audio_filename)
                             
-                            with open(audio_path, "wb") as f:
-                                f.write(audio.get_wav_data())
-                            
-                            # Ensure file is fully written
-                            import time
-                            time.sleep(0.1)  # Small delay to ensure file is written
+                            # Write durably under a temp name, then rename: readers never see a partial file
+                            tmp_path = f"{audio_path}.tmp"
+                            with open(tmp_path, "wb") as f:
+                                # Write the captured frames as-is instead of building a WAV copy with get_wav_data()
+                                with wave.open(f, "wb") as wav_file:
+                                    wav_file.setnchannels(1)
+                                    wav_file.setsampwidth(audio.sample_width)
+                                    wav_file.setframerate(audio.sample_rate)
+                                    wav_file.writeframesraw(audio.frame_data)
+                                f.flush()
+                                os.fsync(f.fileno())
+                            os.replace(tmp_path, audio_path)
                             
                             # Verify file was created and has content
-                            if os.path.exists(audio_path) and os.path.getsize(audio_path) > 0:
-                                print(f"✅ Audio saved to: {audio_path} (size: {os.path.getsize(audio_path)} bytes)")
+                            file_size = os.stat(audio_path).st_size
+                            if file_size > 0:
+                                print(f"✅ Audio saved to: {audio_path} (size: {file_size} bytes)")
                                 return audio_path
                             else:
                                 print(f"❌ Audio file not properly saved: {audio_path}")
@@ -554,28 +754,53 @@ class VoiceService:
             print(f"Error recording audio: {e}")
             return None
     
+    def _recent_calibration(self, device_index: Optional[int]) -> Optional[float]:
+        """Energy threshold measured on this device within the last CALIBRATION_TTL_SECONDS"""
+        calibration = self._calibration.get(device_index)
+        if calibration and time.monotonic() - calibration[0] < CALIBRATION_TTL_SECONDS:
+            return calibration[1]
+        return None
+    
+    def _get_mic_candidates(self) -> List[Tuple[int, str]]:
+        """Input devices as (index, name), best first; enumerated on first use and cached"""
+        if self._mic_candidates is None:
+            mic_list = sr.Microphone.list_microphone_names()
+            print(f"Available microphones: {mic_list}")
+            self._mic_candidates = self._rank_mics(mic_list)
+        return self._mic_candidates
+    
+    def _rank_mics(self, mic_list: List[str]) -> List[Tuple[int, str]]:
+        """Order microphones: headsets first, then built-in devices, then any other input"""
+        scored = [(self._score_mic(mic_name), i, mic_name) for i, mic_name in enumerate(mic_list)]
+        # Highest score first; the stable sort keeps device order within a score
+        scored.sort(key=lambda candidate: -candidate[0])
+        return [(i, mic_name) for score, i, mic_name in scored if score >= 0]
+    
+    @classmethod
+    def _score_mic(cls, mic_name: str) -> int:
+        """2 for headsets, 1 for built-in devices, 0 for other inputs, -1 for non-inputs"""
+        mic_lower = mic_name.lower()
+        if any(keyword in mic_lower for keyword in cls._MIC_EXCLUDE):
+            return -1
+        if any(keyword in mic_lower for keyword in cls._MIC_PREFERRED):
+            return 2
+        if any(keyword in mic_lower for keyword in cls._MIC_FALLBACK):
+            return 1
+        return 0
+    
     def get_supported_languages(self) -> Dict[str, str]:
         """Get list of supported languages"""
-        return {
-            'en': 'English',
-            'hi': 'Hindi',
-            'ta': 'Tamil',
-            'te': 'Telugu',
-            'bn': 'Bengali',
-            'mr': 'Marathi',
-            'gu': 'Gujarati',
-            'kn': 'Kannada',
-            'ml': 'Malayalam',
-            'pa': 'Punjabi'
-        }
+        return dict(SUPPORTED_LANGUAGES)
     
     def get_system_status(self) -> Dict[str, any]:
         """Get voice system status and capabilities"""
         return {
             'online_tts_available': True,  # Google TTS always available
+            'online_tts_paused': time.monotonic() < self._gtts_open_until,
             'offline_tts_available': self.offline_tts_engine is not None,
             'ffmpeg_available': getattr(self, 'ffmpeg_available', False),
-            'whisper_available': self.whisper_model is not None,
+            'whisper_available': _whisper_model is not None,
+            'whisper_status': _whisper_status(),
             'server_speech_recognition': True,  # Using server-side Google Speech Recognition
             'speech_recognition_available': True,  # Always available via server
             'supported_languages': self.get_supported_languages(),
@@ -596,8 +821,13 @@ class VoiceService:
         if not self.offline_tts_engine:
             recommendations.append("⚠️ Install pyttsx3 for offline text-to-speech (optional)")
         
-        if not self.whisper_model:
-            recommendations.append("⚠️ Install Whisper for offline speech recognition (optional)")
+        whisper_status = _whisper_status()
+        if whisper_status == 'not_installed':
+            recommendations.append("⚠️ Install faster-whisper for offline speech recognition (optional)")
+        elif whisper_status == 'loading':
+            recommendations.append("⏳ Offline speech recognition (Whisper) is still loading")
+        elif whisper_status == 'failed':
+            recommendations.append("⚠️ Whisper model could not be loaded; offline speech recognition is unavailable")
         
         recommendations.append("🌐 Internet connection required for voice features")
         recommendations.append("🎤 Speak clearly for better recognition accuracy")